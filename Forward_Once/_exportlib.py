@@ -0,0 +1,336 @@
+"""
+Shared helpers for export_once.py: timestamps, JSON state files, and finding
+the latest exported message (byte scan / streaming parse / per-file cache).
+"""
+
+import concurrent.futures
+import datetime
+import functools
+import json
+import mmap
+import os
+import re
+from pathlib import Path
+
+try:
+    import ijson  # optional: streaming parse for large exports
+except ImportError:
+    ijson = None
+
+try:
+    import orjson  # optional: faster state/export (de)serialization
+except ImportError:
+    orjson = None
+
+TS_KEYS = ("timestamp", "Timestamp", "timestampISO")
+TAIL_BYTES = 64 * 1024
+# "<key>": "<ISO body><tz>" -- tz split off so bodies sharing an offset compare as bytes.
+# Anchored to the head of a message object ("id", optional "type", then the
+# timestamp) so embed/other nested "timestamp" keys never match. Layouts that
+# don't match fall through to a real JSON parse.
+TS_RE = re.compile(rb'"id"\s*:\s*"?\d+"?\s*,\s*(?:"type"\s*:\s*"[^"]*"\s*,\s*)?'
+                   rb'"(?:timestamp|Timestamp|timestampISO)"\s*:\s*"([0-9T:.\-]+?)(Z|[+-]\d{2}:\d{2})?"')
+
+# Per-run stat() memo for paths that don't change during a run (finished
+# exports, the exporter binary). Callers reset it with clear_stat_cache().
+_stat_cache: dict[str, os.stat_result] = {}
+
+def stat_cached(p: Path) -> os.stat_result:
+    k = str(p)
+    v = _stat_cache.get(k)
+    return v or _stat_cache.setdefault(k, p.stat())
+
+def clear_stat_cache():
+    _stat_cache.clear()
+
+# Fixed-width, lexicographically monotonic window label used in export filenames.
+LABEL_FMT = "%Y%m%dT%H%M%S"
+
+def label(dt: datetime.datetime) -> str:
+    # Always label in UTC so labels from runs with different offsets still sort.
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.astimezone(datetime.timezone.utc).strftime(LABEL_FMT)
+
+def iso(dt: datetime.datetime) -> str:
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return dt.isoformat()
+
+def _parse_iso_fast(s: str) -> datetime.datetime | None:
+    # Exporter wire format only: YYYY-MM-DDTHH:MM:SS[.fff...](Z|+HH:MM).
+    # Returns None for anything else so callers fall back to fromisoformat.
+    n = len(s)
+    if not (20 <= n <= 35 and s[4] == "-" and s[7] == "-" and s[10] == "T"):
+        return None
+    try:
+        if s[-1] == "Z":
+            tz, end = datetime.timezone.utc, n - 1
+        elif s[-6] in "+-" and s[-3] == ":":
+            off = datetime.timedelta(hours=int(s[-5:-3]), minutes=int(s[-2:]))
+            if not off:
+                tz = datetime.timezone.utc
+            else:
+                tz = datetime.timezone(off if s[-6] == "+" else -off)
+            end = n - 6
+        else:
+            return None
+        us = 0
+        if end > 19:
+            frac = s[20:end]
+            if s[19] != "." or not frac.isdigit():
+                return None
+            us = int((frac + "00000")[:6])
+        elif end != 19:
+            return None
+        return datetime.datetime(int(s[0:4]), int(s[5:7]), int(s[8:10]),
+                                 int(s[11:13]), int(s[14:16]), int(s[17:19]), us, tz)
+    except ValueError:
+        return None
+
+def parse_iso(s: str) -> datetime.datetime:
+    s = s.strip()
+    dt = _parse_iso_fast(s)
+    if dt:
+        return dt
+    try:
+        if len(s) == 10 and s[4] == "-" and s[7] == "-":
+            return datetime.datetime.fromisoformat(s + "T00:00:00")
+        return datetime.datetime.fromisoformat(s)
+    except Exception:
+        raise ValueError(f"Invalid date/ISO string: {s}")
+
+@functools.lru_cache(maxsize=4096)
+def _parse_iso_cached(s: str) -> datetime.datetime:
+    # Per-message timestamps repeat a lot (bursts, edits); CLI args use parse_iso.
+    return _parse_iso_fast(s) or datetime.datetime.fromisoformat(s.replace("Z", "+00:00"))
+
+def read_json(path: Path):
+    if orjson is not None:
+        return orjson.loads(path.read_bytes())
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+_made_dirs: set[Path] = set()
+
+def write_json(path: Path, obj):
+    # State files are tiny and written often, so skip the repeated mkdir once a
+    # parent is known to exist. The tmp + rename stays: a torn state file would
+    # silently reset resume progress.
+    if path.parent not in _made_dirs:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        _made_dirs.add(path.parent)
+    if orjson is not None:
+        buf = orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+    else:
+        buf = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_bytes(buf)
+    tmp.replace(path)
+
+def _max_ts_in(buf) -> datetime.datetime | None:
+    # ISO-8601 strings with the same offset sort lexicographically, so keep the
+    # max raw bytes per offset and only parse those few winners.
+    pairs = TS_RE.findall(buf)
+    if not pairs:
+        return None
+    best: dict[bytes, bytes] = {}
+    if len({tz for _body, tz in pairs}) == 1:
+        # Common case (one offset throughout): a single C-level max() over the tuples.
+        body, tz = max(pairs)
+        best[tz or b"Z"] = body
+    else:
+        for body, tz in pairs:
+            tz = tz or b"Z"
+            if body > best.get(tz, b""):
+                best[tz] = body
+    latest = None
+    for tz, body in best.items():
+        try:
+            dt = _parse_iso_cached((body + tz).decode("ascii"))
+        except ValueError:
+            continue
+        latest = dt if latest is None else max(latest, dt)
+    return latest
+
+def _latest_ts_bytes_scan(file_path: Path) -> datetime.datetime | None:
+    with file_path.open("rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return _max_ts_in(mm)
+
+def _latest_ts_tail_scan(file_path: Path, tail_bytes: int = TAIL_BYTES) -> datetime.datetime | None:
+    # Exporter writes messages oldest-first, so the newest timestamps sit near EOF.
+    # Returns None (caller does a full scan) for small files or if the head
+    # turns out newer than the tail, i.e. the ordering assumption doesn't hold.
+    with file_path.open("rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if size <= tail_bytes * 2:
+            return None
+        head = f.read(tail_bytes)
+        f.seek(size - tail_bytes)
+        tail = f.read()
+    head_dt = _max_ts_in(head)
+    tail_dt = _max_ts_in(tail)
+    if not tail_dt or (head_dt and head_dt > tail_dt):
+        return None
+    return tail_dt
+
+def _latest_ts_streamed(file_path: Path) -> datetime.datetime | None:
+    # Walk parser events and keep only the running max; no message dicts are built.
+    with file_path.open("rb") as f:
+        head = f.read(64).lstrip()
+        f.seek(0)
+        base = "item" if head.startswith(b"[") else "messages.item"
+        wanted = {f"{base}.{k}" for k in TS_KEYS}
+        latest = None
+        for prefix, event, value in ijson.parse(f):
+            if event != "string" or prefix not in wanted:
+                continue
+            try:
+                dt = _parse_iso_cached(value)
+            except Exception:
+                continue
+            latest = dt if latest is None else max(latest, dt)
+        return latest
+
+def find_latest_msg_ts_in_export(file_path: Path, fast_tail: bool = True) -> datetime.datetime | None:
+    try:
+        latest = _latest_ts_tail_scan(file_path) if fast_tail else None
+        if latest:
+            return latest
+        latest = _latest_ts_bytes_scan(file_path)
+        if latest:
+            return latest
+        # No match: unusual layout, fall back to a real JSON parse.
+        if ijson is not None:
+            return _latest_ts_streamed(file_path)
+        data = read_json(file_path)
+        msgs = data.get("messages") if isinstance(data, dict) else data
+        if not isinstance(msgs, list) or not msgs:
+            return None
+        latest = None
+        for m in msgs:
+            ts = m.get("timestamp") or m.get("Timestamp") or m.get("timestampISO")
+            if not ts:
+                continue
+            try:
+                dt = _parse_iso_cached(ts)
+            except Exception:
+                continue
+            latest = dt if latest is None else max(latest, dt)
+        return latest
+    except Exception:
+        return None
+
+def _load_ts_cache(state_dir: Path) -> dict:
+    p = state_dir / ".export_ts_cache.json"
+    if p.exists():
+        try:
+            return read_json(p)
+        except Exception:
+            pass
+    return {}
+
+def _save_ts_cache(state_dir: Path, cache: dict):
+    write_json(state_dir / ".export_ts_cache.json", cache)
+
+def _export_name_re(channel_id: str) -> re.Pattern:
+    # Matches names built in main(): [<guild>_]<channel>_<since>_<until>.json,
+    # where both labels are LABEL_FMT.
+    return re.compile(rf"(?:^|_){re.escape(channel_id)}_(\d{{8}}T\d{{6}})_(\d{{8}}T\d{{6}})\.json$")
+
+def _cap(dt: datetime.datetime | None, end: datetime.datetime) -> datetime.datetime | None:
+    if dt is None:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=datetime.timezone.utc)
+    return min(dt, end)
+
+def scan_exports_for_latest(channel_id: str, export_dir: Path, state_dir: Path,
+                            fast_tail: bool = True) -> datetime.datetime | None:
+    # The window is encoded in the filename, so newest-first ordering needs no I/O.
+    # Only the newest export is opened; older ones are consulted only if the
+    # newer ones hold no messages.
+    name_re = _export_name_re(channel_id)
+    # scandir's DirEntry carries the stat result, so listing + stat is one pass.
+    labelled = []
+    present: set[str] = set()
+    with os.scandir(export_dir) as it:
+        for e in it:
+            if not e.name.endswith(".json"):
+                continue
+            present.add(str(Path(e.path)))
+            if channel_id not in e.name:
+                continue
+            m = name_re.search(e.name)
+            if not m or not e.is_file(follow_symlinks=False):
+                continue
+            _stat_cache.setdefault(e.path, e.stat(follow_symlinks=False))
+            labelled.append((m.group(2), Path(e.path)))
+    labelled.sort(reverse=True)
+    # A message can't be newer than the export's --before bound; cap each
+    # file's result at the window end from its label so a bad value (clock
+    # skew, hand-edited export) can't push the resume point past it.
+    ends = {p: datetime.datetime.strptime(lab, LABEL_FMT).replace(tzinfo=datetime.timezone.utc)
+            for lab, p in labelled}
+
+    # Exports are immutable once written: reuse the cached latest timestamp
+    # while a file's (mtime, size) is unchanged. Cold files are scanned on a
+    # thread pool: the newest one alone first (the usual answer), then, only if
+    # it held no messages, older ones a pool-width at a time.
+    cache = _load_ts_cache(state_dir)
+    # Drop entries for files in this directory that are gone (retention,
+    # manual cleanup); the cache is shared by all channels, so other
+    # channels' files seen in the same listing are kept.
+    here = str(Path(export_dir))
+    stale = [k for k in cache if str(Path(k).parent) == here and k not in present]
+    for k in stale:
+        del cache[k]
+    dirty = bool(stale)
+    best = None
+    paths = [p for _label, p in labelled]
+    workers = min(32, (os.cpu_count() or 1) * 4)
+    i, batch = 0, 1
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as ex:
+        while best is None and i < len(paths):
+            window = paths[i:i + batch]
+            i += batch
+            batch = workers
+            found: dict[Path, datetime.datetime | None] = {}
+            futs = {}
+            for p in window:
+                st = stat_cached(p)
+                entry = cache.get(str(p))
+                if entry and entry.get("m") == st.st_mtime and entry.get("s") == st.st_size:
+                    dt = datetime.datetime.fromisoformat(entry["t"]) if entry.get("t") else None
+                    found[p] = _cap(dt, ends[p])
+                else:
+                    futs[p] = ex.submit(find_latest_msg_ts_in_export, p, fast_tail)
+            for p, fut in futs.items():
+                st = stat_cached(p)
+                dt = fut.result()
+                found[p] = _cap(dt, ends[p])
+                cache[str(p)] = {"m": st.st_mtime, "s": st.st_size, "t": iso(found[p]) if found[p] else None}
+                dirty = True
+            for p in window:
+                if found[p]:
+                    best = found[p]
+                    break
+    if dirty:
+        _save_ts_cache(state_dir, cache)
+    return best
+
+def load_state(state_dir: Path, channel_id: str) -> dict:
+    p = state_dir / f"channel_{channel_id}.json"
+    if p.exists():
+        try:
+            return read_json(p)
+        except Exception:
+            pass
+    return {}
+
+def save_state(state_dir: Path, channel_id: str, last_exported_iso: str):
+    p = state_dir / f"channel_{channel_id}.json"
+    write_json(p, {"last_exported_iso": last_exported_iso})
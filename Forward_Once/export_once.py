@@ -8,85 +8,230 @@ Export a window with DiscordChatExporter and immediately forward it with forward
 """
 
 import argparse
+import concurrent.futures
 import datetime
-import json
-import os
 import subprocess
 import sys
+import threading
 from pathlib import Path
 
-def iso(dt: datetime.datetime) -> str:
-    if dt.tzinfo is None:
-        dt = dt.replace(tzinfo=datetime.timezone.utc)
-    return dt.isoformat()
+from _exportlib import (
+    clear_stat_cache, find_latest_msg_ts_in_export, iso, label, load_state,
+    parse_iso, read_json, save_state, scan_exports_for_latest, stat_cached, write_json,
+)
 
-def parse_iso(s: str) -> datetime.datetime:
-    s = s.strip()
-    try:
-        if len(s) == 10 and s[4] == "-" and s[7] == "-":
-            return datetime.datetime.fromisoformat(s + "T00:00:00")
-        return datetime.datetime.fromisoformat(s)
-    except Exception:
-        raise ValueError(f"Invalid date/ISO string: {s}")
-
-def read_json(path: Path):
-    with path.open("r", encoding="utf-8") as f:
-        return json.load(f)
-
-def write_json(path: Path, obj):
-    path.parent.mkdir(parents=True, exist_ok=True)
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    with tmp.open("w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
-    tmp.replace(path)
-
-def find_latest_msg_ts_in_export(file_path: Path) -> datetime.datetime | None:
-    try:
-        data = read_json(file_path)
-        msgs = data.get("messages") if isinstance(data, dict) else data
-        if not isinstance(msgs, list) or not msgs:
-            return None
-        latest = None
-        for m in msgs:
-            ts = m.get("timestamp") or m.get("Timestamp") or m.get("timestampISO")
-            if not ts:
-                continue
-            try:
-                dt = datetime.datetime.fromisoformat(ts.replace("Z", "+00:00"))
-            except Exception:
-                continue
-            latest = dt if latest is None else max(latest, dt)
-        return latest
-    except Exception:
-        return None
-
-def scan_exports_for_latest(channel_id: str, export_dir: Path) -> datetime.datetime | None:
-    best = None
-    for p in export_dir.glob("*.json"):
-        dt = find_latest_msg_ts_in_export(p)
-        if dt:
-            best = dt if best is None else max(best, dt)
-    return best
-
-def load_state(state_dir: Path, channel_id: str) -> dict:
-    p = state_dir / f"channel_{channel_id}.json"
-    if p.exists():
+def _run_streamed(cmd: list[str], echo_stdout: bool = True) -> int:
+    # Tee child output line by line as it arrives instead of buffering it all.
+    # Reader threads rather than selectors: pipes aren't selectable on Windows.
+    p = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                         text=True, encoding="utf-8", errors="replace", bufsize=1)
+
+    def _pump(src, dst, echo):
+        for line in src:
+            if echo:
+                dst.write(line)
+                dst.flush()
+        src.close()
+
+    threads = [
+        threading.Thread(target=_pump, args=(p.stdout, sys.stdout, echo_stdout), daemon=True),
+        threading.Thread(target=_pump, args=(p.stderr, sys.stderr, True), daemon=True),
+    ]
+    for t in threads:
+        t.start()
+    rc = p.wait()
+    for t in threads:
+        t.join()
+    return rc
+
+def fwd_prefix(args, forwarder_py: Path) -> tuple[str, ...]:
+    # Run-invariant part of the forwarder argv; build once, reuse per export.
+    prefix = (sys.executable, str(forwarder_py),
+              "--max-attach-mb", str(args.max_attach_mb),
+              "--max-files-per-post", str(args.max_files_per_post))
+    if args.dry_run:
+        prefix += ("--dry-run",)
+    if args.verbose:
+        prefix += ("--verbose",)
+    return prefix
+
+def build_fwd_cmd(prefix: tuple[str, ...], webhook: str, out_path: Path,
+                  fwd_state: Path, fwd_idmap: Path, fwd_latest: Path) -> list[str]:
+    # "--webhook" must stay first after the prefix; the verbose log redacts by position.
+    return [*prefix,
+            "--webhook", webhook,
+            "--json", str(out_path),
+            "--state", str(fwd_state),
+            "--id-map", str(fwd_idmap),
+            "--emit-latest-ts", str(fwd_latest)]
+
+def build_export_cmd(exporter: Path, token: str, channel_id: str, out_path: Path,
+                     since_eff: datetime.datetime, until_eff: datetime.datetime) -> list[str]:
+    # DiscordChatExporter CLI typical args:
+    # DiscordChatExporter.Cli.exe export -t <token> -c <channel> -f Json -o <file> --after <iso> --before <iso>
+    # "-t" must stay at index 2; the verbose log redacts the token by position.
+    return [
+        str(exporter),
+        "export",
+        "-t", token,
+        "-c", channel_id,
+        "-f", "Json",
+        "-o", str(out_path),
+        "--after", iso(since_eff),
+        "--before", iso(until_eff),
+    ]
+
+def split_window(since_eff: datetime.datetime, until_eff: datetime.datetime, n: int,
+                 overlap: datetime.timedelta) -> list[tuple[datetime.datetime, datetime.datetime]]:
+    # --pipeline N: N consecutive sub-windows, inner boundaries widened by the
+    # edge overlap like the outer ones (the forwarder dedupes the repeats).
+    if n <= 1:
+        return [(since_eff, until_eff)]
+    step = (until_eff - since_eff) / n
+    cuts = [since_eff + step * i for i in range(1, n)]
+    return list(zip([since_eff] + [c - overlap for c in cuts],
+                    [c + overlap for c in cuts] + [until_eff]))
+
+def resolve_since(args, channel_id: str, export_dir: Path, state_dir: Path,
+                  until_dt: datetime.datetime) -> datetime.datetime:
+    if args.since:
+        return parse_iso(args.since)
+    since_dt = None
+    last_iso = load_state(state_dir, channel_id).get("last_exported_iso")
+    if last_iso:
         try:
-            return read_json(p)
+            since_dt = datetime.datetime.fromisoformat(last_iso)
         except Exception:
-            pass
-    return {}
+            since_dt = None
+
+    if not since_dt:
+        guess = scan_exports_for_latest(channel_id, export_dir, state_dir, args.fast_tail)
+        if guess:
+            until_cap = until_dt if until_dt.tzinfo else until_dt.replace(tzinfo=datetime.timezone.utc)
+            since_dt = min(guess, until_cap)
+        else:
+            # default: 14 days lookback on first run (safe)
+            since_dt = until_dt - datetime.timedelta(days=14)
+    return since_dt
+
+def finish_channel(args, channel_id: str, state_dir: Path, out_path: Path, fwd_latest: Path,
+                   until_eff: datetime.datetime):
+    latest_dt = None
+    if fwd_latest.exists():
+        try:
+            latest_dt = datetime.datetime.fromisoformat(read_json(fwd_latest)["latest_iso"])
+        except Exception:
+            latest_dt = None
+    if not latest_dt:
+        latest_dt = find_latest_msg_ts_in_export(out_path, args.fast_tail)
+    if not latest_dt and args.verbose:
+        print(f"[warn] Could not detect latest timestamp in export for channel={channel_id}; using window end.")
+
+    # Update state (use actual latest if available, else until_eff)
+    # Never resume past the window end.
+    until_cap = until_eff if until_eff.tzinfo else until_eff.replace(tzinfo=datetime.timezone.utc)
+    final_dt = min(latest_dt, until_cap) if latest_dt else until_eff
+    save_state(state_dir, channel_id, iso(final_dt))
+    if args.verbose:
+        print(f"[info] Updated state last_exported_iso = {iso(final_dt)} (channel={channel_id})")
+
+def read_channels_file(path: Path) -> list[tuple[str, str]]:
+    # One "<channel_id> <webhook_url>" per line; blank lines and # comments skipped.
+    out = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        parts = line.split()
+        if len(parts) != 2:
+            raise ValueError(f"Bad line in channels file (want '<channel_id> <webhook>'): {line}")
+        out.append((parts[0], parts[1]))
+    return out
+
+def export_batch(args, channels: list[tuple[str, str]], exporter: Path, export_dir: Path,
+                 state_dir: Path, forwarder_py: Path, until_dt: datetime.datetime):
+    """
+    Export all channels with one exporter process and forward them with one
+    forwarder process, so the exporter's .NET startup and the forwarder's
+    interpreter/session startup are paid once instead of per channel.
+    The shared window starts at the earliest per-channel resume point; channels
+    that are further ahead are re-exported a bit, and the forwarder's dedupe
+    drops what was already sent.
+    """
+    def _utc(dt):
+        return dt if dt.tzinfo else dt.replace(tzinfo=datetime.timezone.utc)
+
+    since_dt = min(_utc(resolve_since(args, cid, export_dir, state_dir, until_dt)) for cid, _wh in channels)
+    overlap = datetime.timedelta(seconds=max(0, args.edge_overlap_seconds))
+    since_eff = since_dt - overlap
+    until_eff = until_dt + overlap
+
+    guild_part = f"{args.guild}_" if args.guild else ""
+    suffix = f"_{label(since_eff)}_{label(until_eff)}.json"
+    # %c is the exporter's own output-path placeholder for the channel ID.
+    out_template = export_dir / f"{guild_part}%c{suffix}"
+
+    if args.verbose:
+        print(f"[info] Exporting {len(channels)} channels: since={since_eff.isoformat()} until={until_eff.isoformat()}")
+        print(f"[info] -> {out_template}")
 
-def save_state(state_dir: Path, channel_id: str, last_exported_iso: str):
-    p = state_dir / f"channel_{channel_id}.json"
-    write_json(p, {"last_exported_iso": last_exported_iso})
+    # Multiple channel IDs after -c need a DiscordChatExporter build that accepts them (2.30+).
+    cmd = [str(exporter), "export", "-t", args.token, "-c", *[cid for cid, _wh in channels],
+           "-f", "Json", "-o", str(out_template), "--after", iso(since_eff), "--before", iso(until_eff)]
+    if args.verbose:
+        print("[info] Running exporter (token redacted):", " ".join([cmd[0]] + cmd[1:3] + ["***"] + cmd[4:]))
+
+    rc = _run_streamed(cmd, echo_stdout=args.verbose)
+    if rc != 0:
+        print("[error] Export failed.", file=sys.stderr)
+        sys.exit(rc)
+
+    jobs, done = [], []
+    for cid, webhook in channels:
+        out_path = export_dir / f"{guild_part}{cid}{suffix}"
+        if not out_path.exists():
+            print(f"[warn] No export produced for channel={cid}; skipping.", file=sys.stderr)
+            continue
+        fwd_latest = state_dir / f"forward_latest_{cid}.json"
+        fwd_latest.unlink(missing_ok=True)
+        jobs.append({
+            "json": str(out_path),
+            "webhook": webhook,
+            "state": str(state_dir / f"forward_state_{cid}.json"),
+            "id_map": str(state_dir / f"id_map_{cid}.json"),
+            "emit_latest_ts": str(fwd_latest),
+        })
+        done.append((cid, out_path, fwd_latest))
+    if not jobs:
+        print("[error] Exporter produced no files.", file=sys.stderr)
+        sys.exit(2)
+
+    jobs_path = state_dir / "forward_jobs.json"
+    write_json(jobs_path, jobs)
+    fwd_cmd = [*fwd_prefix(args, forwarder_py), "--jobs-file", str(jobs_path)]
+    if args.verbose:
+        print("[info] Forwarding:", " ".join(fwd_cmd))
+
+    rc2 = _run_streamed(fwd_cmd)
+    jobs_path.unlink(missing_ok=True)
+    if rc2 != 0:
+        print("[error] Forwarding failed.", file=sys.stderr)
+        sys.exit(rc2)
+
+    for cid, out_path, fwd_latest in done:
+        finish_channel(args, cid, state_dir, out_path, fwd_latest, until_eff)
+
+    print(f"[done] Exported and forwarded {len(done)} channels once.")
 
 def main():
     ap = argparse.ArgumentParser(description="Export once and forward.")
     ap.add_argument("--token", required=True, help="Discord token for DiscordChatExporter")
-    ap.add_argument("--channel", required=True, help="Channel ID to export")
+    ap.add_argument("--channel", default="", help="Channel ID to export")
     ap.add_argument("--guild", default="", help="Optional Guild ID (for nicer file name)")
-    ap.add_argument("--webhook", required=True, help="Destination Discord webhook")
+    ap.add_argument("--webhook", default="", help="Destination Discord webhook")
+    ap.add_argument("--channels", default="",
+                    help="File of '<channel_id> <webhook>' lines; exports all of them in one exporter run "
+                         "(replaces --channel/--webhook)")
 
     ap.add_argument("--export-dir", default="exports", help="Where to save exporter JSON")
     ap.add_argument("--state-dir", default="state", help="Folder to store per-channel resume state")
@@ -98,123 +243,103 @@ def main():
     ap.add_argument("--until", default="", help="End (YYYY-MM-DD or ISO). Default = now")
     ap.add_argument("--edge-overlap-seconds", type=int, default=60,
                     help="Expand export window on both sides to avoid boundary misses.")
+    ap.add_argument("--fast-tail", action=argparse.BooleanOptionalAction, default=True,
+                    help="Read only the end of an export to find its latest timestamp (default: on)")
 
     # Forwarding passthrough
     ap.add_argument("--max-attach-mb", type=float, default=7.8, help="Max per-file upload size")
     ap.add_argument("--max-files-per-post", type=int, default=8, help="Max files per webhook post (<=10)")
     ap.add_argument("--dry-run", action="store_true", help="Forwarder dry-run (export still runs)")
+    ap.add_argument("--pipeline", type=int, default=0, metavar="N",
+                    help="Export the window as N consecutive slices, downloading slice k+1 while "
+                         "slice k is forwarded (0/1 = one export; single-channel mode only)")
     ap.add_argument("--verbose", action="store_true", help="Verbose logging")
 
     args = ap.parse_args()
+    clear_stat_cache()
 
     export_dir = Path(args.export_dir); export_dir.mkdir(parents=True, exist_ok=True)
     state_dir = Path(args.state_dir); state_dir.mkdir(parents=True, exist_ok=True)
     exporter = Path(args.exporter_path)
-    if not exporter.exists():
+    try:
+        stat_cached(exporter)
+    except OSError:
         print(f"[error] Exporter not found at: {exporter}", file=sys.stderr); sys.exit(2)
 
     forwarder_py = Path(args.forwarder_path) if args.forwarder_path else Path(__file__).with_name("forward_once.py")
 
     # Determine window
     until_dt = parse_iso(args.until) if args.until else datetime.datetime.now(datetime.timezone.utc)
-    since_dt: datetime.datetime
-    if args.since:
-        since_dt = parse_iso(args.since)
-    else:
-        st = load_state(state_dir, args.channel)
-        last_iso = st.get("last_exported_iso")
-        if last_iso:
-            try:
-                since_dt = datetime.datetime.fromisoformat(last_iso)
-            except Exception:
-                since_dt = None
-        else:
-            since_dt = None
 
-        if not since_dt:
-            guess = scan_exports_for_latest(args.channel, export_dir)
-            if guess:
-                since_dt = guess
-            else:
-                # default: 14 days lookback on first run (safe)
-                since_dt = until_dt - datetime.timedelta(days=14)
+    if args.channels:
+        try:
+            channels = read_channels_file(Path(args.channels))
+        except Exception as e:
+            print(f"[error] Failed to read channels file: {e}", file=sys.stderr); sys.exit(2)
+        if not channels:
+            print("[error] Channels file lists no channels.", file=sys.stderr); sys.exit(2)
+        if args.pipeline > 1:
+            print("[warn] --pipeline is single-channel only; ignored with --channels", file=sys.stderr)
+        export_batch(args, channels, exporter, export_dir, state_dir, forwarder_py, until_dt)
+        return
+    if not (args.channel and args.webhook):
+        ap.error("--channel and --webhook are required unless --channels is given")
+
+    since_dt = resolve_since(args, args.channel, export_dir, state_dir, until_dt)
 
     # Apply overlap
     overlap = datetime.timedelta(seconds=max(0, args.edge_overlap_seconds))
     since_eff = since_dt - overlap
     until_eff = until_dt + overlap
 
-    # Build filename
     guild_part = f"{args.guild}_" if args.guild else ""
-    out_name = f"{guild_part}{args.channel}_{since_eff.strftime('%Y%m%dT%H%M%S')}_{until_eff.strftime('%Y%m%dT%H%M%S')}.json"
-    out_path = export_dir / out_name
-
-    if args.verbose:
-        print(f"[info] Exporting: channel={args.channel} since={since_eff.isoformat()} until={until_eff.isoformat()}")
-        print(f"[info] -> {out_path}")
-
-    # Run exporter
-    # DiscordChatExporter CLI typical args:
-    # DiscordChatExporter.Cli.exe export -t <token> -c <channel> -f Json -o <file> --after <iso> --before <iso>
-    cmd = [
-        str(exporter),
-        "export",
-        "-t", args.token,
-        "-c", args.channel,
-        "-f", "Json",
-        "-o", str(out_path),
-        "--after", iso(since_eff),
-        "--before", iso(until_eff),
-    ]
-    if args.verbose:
-        print("[info] Running exporter (token redacted):", " ".join([cmd[0]] + cmd[1:3] + ["***"] + cmd[4:]))
+    slices = split_window(since_eff, until_eff, args.pipeline, overlap)
 
-    r = subprocess.run(cmd, capture_output=True, text=True)
-    if args.verbose:
-        sys.stdout.write(r.stdout)
-    if r.returncode != 0:
-        sys.stderr.write(r.stderr)
-        print("[error] Export failed.", file=sys.stderr)
-        sys.exit(r.returncode)
-
-    # Find latest message timestamp in the exported file
-    latest_dt = find_latest_msg_ts_in_export(out_path)
-    if not latest_dt and args.verbose:
-        print("[warn] Could not detect latest timestamp in export; forwarding anyway.")
+    def _export(k: int) -> tuple[Path, int]:
+        s_eff, u_eff = slices[k]
+        out_path = export_dir / f"{guild_part}{args.channel}_{label(s_eff)}_{label(u_eff)}.json"
+        if args.verbose:
+            part = f" (slice {k + 1}/{len(slices)})" if len(slices) > 1 else ""
+            print(f"[info] Exporting{part}: channel={args.channel} since={s_eff.isoformat()} until={u_eff.isoformat()}")
+            print(f"[info] -> {out_path}")
+        cmd = build_export_cmd(exporter, args.token, args.channel, out_path, s_eff, u_eff)
+        if args.verbose:
+            print("[info] Running exporter (token redacted):", " ".join([cmd[0]] + cmd[1:3] + ["***"] + cmd[4:]))
+        return out_path, _run_streamed(cmd, echo_stdout=args.verbose)
 
-    # Forward
     fwd_state = state_dir / f"forward_state_{args.channel}.json"
     fwd_idmap = state_dir / f"id_map_{args.channel}.json"
+    fwd_latest = state_dir / f"forward_latest_{args.channel}.json"
+    prefix = fwd_prefix(args, forwarder_py)
 
-    fwd_cmd = [
-        sys.executable, str(forwarder_py),
-        "--webhook", args.webhook,
-        "--json", str(out_path),
-        "--state", str(fwd_state),
-        "--id-map", str(fwd_idmap),
-        "--max-attach-mb", str(args.max_attach_mb),
-        "--max-files-per-post", str(args.max_files_per_post),
-    ]
-    if args.dry_run:
-        fwd_cmd.append("--dry-run")
-    if args.verbose:
-        fwd_cmd.append("--verbose")
+    # The exporter runs one slice ahead on a worker thread, so with --pipeline
+    # slice k+1 downloads while slice k is being forwarded. A slice's file is
+    # complete before the forwarder opens it.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
+        nxt = ex.submit(_export, 0)
+        for k, (_s_eff, u_eff) in enumerate(slices):
+            out_path, rc = nxt.result()
+            if rc != 0:
+                print("[error] Export failed.", file=sys.stderr)
+                sys.exit(rc)
+            if k + 1 < len(slices):
+                nxt = ex.submit(_export, k + 1)
 
-    if args.verbose:
-        print("[info] Forwarding (webhook redacted):", " ".join(fwd_cmd[:3] + ["***"] + fwd_cmd[4:]))
+            fwd_latest.unlink(missing_ok=True)
+            fwd_cmd = build_fwd_cmd(prefix, args.webhook, out_path, fwd_state, fwd_idmap, fwd_latest)
+            if args.verbose:
+                n = len(prefix)
+                print("[info] Forwarding (webhook redacted):", " ".join(fwd_cmd[:n + 1] + ["***"] + fwd_cmd[n + 2:]))
 
-    r2 = subprocess.run(fwd_cmd, capture_output=True, text=True)
-    sys.stdout.write(r2.stdout)
-    if r2.returncode != 0:
-        sys.stderr.write(r2.stderr)
-        print("[error] Forwarding failed.", file=sys.stderr)
-        sys.exit(r2.returncode)
+            # The forwarder already parses the export and reports its latest timestamp;
+            # finish_channel only scans the file if that sidecar is missing.
+            rc2 = _run_streamed(fwd_cmd)
+            if rc2 != 0:
+                print("[error] Forwarding failed.", file=sys.stderr)
+                sys.exit(rc2)
 
-    # Update state (use actual latest if available, else until_eff)
-    final_dt = latest_dt or until_eff
-    save_state(state_dir, args.channel, iso(final_dt))
-    if args.verbose:
-        print(f"[info] Updated state last_exported_iso = {iso(final_dt)}")
+            # State advances per slice, so a later failure resumes from here.
+            finish_channel(args, args.channel, state_dir, out_path, fwd_latest, u_eff)
 
     print("[done] Exported and forwarded once.")
 
@@ -8,17 +8,34 @@ Forward DiscordChatExporter JSON to a Discord webhook, with:
 - Dry-run & verbose logging
 """
 
+from __future__ import annotations
+
 import argparse
 import json
 import os
+import random
 import re
 import sys
+import threading
 import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Tuple, Optional
+from typing import TYPE_CHECKING, Dict, List, Any, Tuple, Optional, Iterable, Iterator, AbstractSet
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
-import requests
+if TYPE_CHECKING:
+    import requests  # imported lazily in session_with_retries(); --dry-run never needs it
+
+try:
+    import orjson  # optional: much faster state/export (de)serialization
+except ImportError:
+    orjson = None
+
+try:
+    import ijson  # optional: stream giant exports instead of loading them whole
+except ImportError:
+    ijson = None
 
 # ----------------- Small utils -----------------
 
@@ -31,22 +48,43 @@ def load_json(path: str, default):
     if not path or not os.path.exists(path):
         return default
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return read_json_file(path)
     except Exception:
         return default
 
+def read_json_file(path: str) -> Any:
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def dumps_json(data: Any) -> str:
+    # orjson emits UTF-8 without ASCII escaping, same as ensure_ascii=False.
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False)
+
 def save_json(path: str, data: Any):
+    # Compact: these are machine state (seen ids, id map) that grow large.
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    if orjson is not None:
+        body = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
     tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    with open(tmp, "wb") as f:
+        f.write(body)
     os.replace(tmp, path)
 
 def clamp_webhook_username(u: str) -> str:
     return (u or "")[:80]
 
 def ensure_query_param(url: str, key: str, value: str) -> str:
+    # Fast path: already present with the wanted value (no parse/rebuild).
+    query = url.split("#", 1)[0].partition("?")[2]
+    if f"{key}={value}" in query.split("&"):
+        return url
     u = urlparse(url)
     q = dict(parse_qsl(u.query))
     if q.get(key) != value:
@@ -61,17 +99,13 @@ def first_n(s: str, n: int) -> str:
 def chunk_text(s: str, limit: int = 1900) -> List[str]:
     """Split text under Discord 2000 cap; leaves headroom for prefixes."""
     s = s or ""
-    if not s:
-        return [""]
-    out: List[str] = []
-    while s:
-        out.append(s[:limit])
-        s = s[limit:]
-    return out
+    return [s[i:i + limit] for i in range(0, len(s), limit)] or [""]
+
+# Windows-forbidden chars and control chars
+_FN_BAD = re.compile(r"[\\/:*?\"<>|\x00-\x1F]")
 
 def sanitize_filename(fn: str) -> str:
-    # Windows-forbidden chars and control chars
-    fn = re.sub(r"[\\/:*?\"<>|\x00-\x1F]", "_", fn or "file")
+    fn = _FN_BAD.sub("_", fn or "file")
     if len(fn) > 180:
         base, ext = os.path.splitext(fn)
         fn = base[:170] + "~" + ext[:9]
@@ -100,20 +134,58 @@ def extract_reply_reference(msg: Dict[str, Any]) -> Optional[str]:
 
     return None
 
-def normalize_export(obj: Any) -> List[Dict[str, Any]]:
+def stream_messages(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Yields raw exporter messages one at a time (ijson), so memory stays at
+    one message instead of the whole parsed export. Falls back to a full load.
+    """
+    if ijson is None:
+        obj = read_json_file(path)
+        msgs = obj.get("messages") if isinstance(obj, dict) else obj
+        if isinstance(msgs, list):
+            yield from msgs
+        return
+    with open(path, "rb") as f:
+        head = f.read(64).lstrip()
+        f.seek(0)
+        prefix = "item" if head[:1] == b"[" else "messages.item"
+        yield from ijson.items(f, prefix, use_float=True)
+
+def message_ts(msg: Dict[str, Any]) -> str:
+    return msg.get("timestamp") or msg.get("Timestamp") or msg.get("timestampISO") or ""
+
+def tally_messages(msgs: Iterable[Dict[str, Any]], stats: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    # Counts messages and tracks the latest timestamp as they stream past.
+    for msg in msgs:
+        stats["count"] = stats.get("count", 0) + 1
+        try:
+            dt = datetime.fromisoformat(message_ts(msg).replace("Z", "+00:00"))
+        except Exception:
+            dt = None
+        if dt is not None:
+            if dt.tzinfo is None:
+                dt = dt.replace(tzinfo=timezone.utc)
+            latest = stats.get("latest")
+            if latest is None or dt > latest:
+                stats["latest"] = dt
+        yield msg
+
+def normalize_export(obj: Any, skip_ids: AbstractSet[str] = frozenset()) -> Iterator[Dict[str, Any]]:
     """
-    Accepts DiscordChatExporter JSON (list or dict) and returns a uniform list.
+    Accepts DiscordChatExporter JSON (list or dict) or an iterable of raw
+    messages and yields uniform dicts one at a time, skipping ids in skip_ids.
     Each item has: id, timestamp, content, username, avatar_url, attachments,
     embeds, reply_to_id, reply_preview, jump_url
     """
     msgs = obj.get("messages") if isinstance(obj, dict) else obj
-    if not isinstance(msgs, list):
-        return []
+    if msgs is None or isinstance(msgs, (str, bytes)):
+        return
 
-    norm: List[Dict[str, Any]] = []
     for msg in msgs:
         m_id = str(msg.get("id") or "")
-        ts = msg.get("timestamp") or msg.get("Timestamp") or msg.get("timestampISO") or ""
+        if m_id in skip_ids:
+            continue
+        ts = message_ts(msg)
         content = msg.get("content") or msg.get("Content") or ""
         author = msg.get("author") or {}
         username = author.get("name") or author.get("username") or "Unknown"
@@ -149,7 +221,7 @@ def normalize_export(obj: Any) -> List[Dict[str, Any]]:
                 rcontent = first_n(ref_msg.get("content") or "", 120)
                 ref_preview = f"Replying to {rauthor}: “{rcontent}”"
 
-        norm.append({
+        yield {
             "id": m_id,
             "timestamp": ts,
             "content": content,
@@ -160,34 +232,114 @@ def normalize_export(obj: Any) -> List[Dict[str, Any]]:
             "reply_to_id": reply_to,
             "reply_preview": ref_preview,
             "jump_url": msg.get("url") or msg.get("jumpUrl") or None,
-        })
-    return norm
+        }
 
 # ----------------- HTTP with retry/backoff -----------------
 
-def session_with_retries() -> requests.Session:
+def session_with_retries(http2: bool = False) -> requests.Session:
+    if http2:
+        client = _httpx_client()
+        if client is not None:
+            return client
+
+    import requests
+    from requests.adapters import HTTPAdapter
+
     s = requests.Session()
-    # Small pool; we do manual retry to respect 429 Retry-After precisely.
-    s.headers.update({"User-Agent": "discord-forwarder/1.1"})
+    # Few hosts (discord.com + CDN) but room for many keep-alive sockets each,
+    # so webhook posts and attachment fetches reuse TLS connections.
+    # No adapter-level retries; we do manual retry to respect 429 Retry-After precisely.
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=64, pool_block=False)
+    s.mount("https://", adapter)
+    s.mount("http://", adapter)
+    s.headers.update({
+        "User-Agent": "discord-forwarder/1.1",
+        "Connection": "keep-alive",
+        "Accept-Encoding": "gzip, deflate",
+    })
     return s
 
+def _httpx_client():
+    """
+    Optional HTTP/2 client (httpx + h2). Duck-types the requests.Session calls
+    used here (post/headers/status_code/json); None if httpx isn't installed.
+    """
+    try:
+        import httpx
+        import h2  # noqa: F401  (http2=True needs it)
+    except ImportError:
+        print("[warn] --http2 needs 'httpx[http2]'; falling back to requests", file=sys.stderr)
+        return None
+    return httpx.Client(
+        http2=True,
+        limits=httpx.Limits(max_connections=16, max_keepalive_connections=16),
+        timeout=45,
+        follow_redirects=True,
+        headers={"User-Agent": "discord-forwarder/1.1"},
+    )
+
+def _is_httpx(session) -> bool:
+    return type(session).__module__.startswith("httpx")
+
+# One requests session per thread (requests.Session isn't thread-safe), as in
+# forward_loop.py: attachment fetchers each reuse their own connection pool.
+# An httpx client is thread-safe and multiplexed, so it is shared instead.
+_local = threading.local()
+
+def thread_session(shared: Optional[requests.Session] = None) -> requests.Session:
+    if shared is not None and _is_httpx(shared):
+        return shared
+    sess = getattr(_local, "sess", None)
+    if sess is None:
+        sess = _local.sess = session_with_retries()
+    return sess
+
 def _sleep_backoff(i: int, base: float = 0.8, cap: float = 10.0):
-    # exponential backoff with jitter
-    t = min(cap, base * (2 ** i)) + (0.05 * i)
+    # exponential backoff with full jitter, so concurrent retries don't line up
+    t = random.uniform(0, min(cap, base * (1 << i)))
     time.sleep(t)
 
+# Bucket refill time per webhook URL: each webhook has its own Discord bucket,
+# and one session serves every job in --jobs-file mode.
+_rl_reset: Dict[str, float] = {}
+_rl_lock = threading.Lock()
+
+def _note_rate_limit(webhook_url: str, resp: requests.Response):
+    # Discord reports the bucket on every response; once it is drained, remember
+    # when it refills so the next post waits instead of eating a 429.
+    if resp.headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            reset_after = float(resp.headers.get("X-RateLimit-Reset-After") or "0")
+        except ValueError:
+            reset_after = 0.0
+        if reset_after > 0:
+            with _rl_lock:
+                _rl_reset[webhook_url] = time.monotonic() + reset_after
+
+def _wait_for_rate_limit(webhook_url: str, verbose: bool):
+    with _rl_lock:
+        reset = _rl_reset.get(webhook_url, 0.0)
+    delay = reset - time.monotonic()
+    if delay > 0:
+        if verbose:
+            print(f"[http] rate-limit bucket empty; sleeping {delay:.2f}s", file=sys.stderr)
+        time.sleep(delay)
+
 def post_webhook(session: requests.Session, webhook_url: str, payload: Dict[str, Any],
                  files: Optional[List[Tuple[str, Tuple[str, bytes, str]]]] = None,
                  verbose: bool = False) -> requests.Response:
-    wh = ensure_query_param(webhook_url, "wait", "true")
+    # webhook_url must already carry wait=true (added once per job in forward_job)
+    # so the response includes the created message id.
+    wh = webhook_url
+    # payload_json for multipart uploads; serialized once, reused across retries
+    form = {"payload_json": dumps_json(payload)} if files else None
     tries = 0
     last_resp: Optional[requests.Response] = None
     while True:
+        _wait_for_rate_limit(wh, verbose)
         try:
             if files:
-                # payload_json for multipart uploads
-                resp = session.post(wh, data={"payload_json": json.dumps(payload, ensure_ascii=False)},
-                                    files=files, timeout=90)
+                resp = session.post(wh, data=form, files=files, timeout=90)
             else:
                 resp = session.post(wh, json=payload, timeout=45)
         except Exception as e:
@@ -200,6 +352,8 @@ def post_webhook(session: requests.Session, webhook_url: str, payload: Dict[str,
             tries += 1
             continue
 
+        _note_rate_limit(wh, resp)
+
         if resp.status_code == 429:
             retry_after = float(resp.headers.get("Retry-After", "1"))
             if verbose:
@@ -222,21 +376,21 @@ def post_webhook(session: requests.Session, webhook_url: str, payload: Dict[str,
 
         return resp
 
-def head_file(session: requests.Session, url: str) -> Optional[requests.Response]:
-    try:
-        return session.head(url, timeout=20, allow_redirects=True)
-    except Exception:
-        return None
-
 def get_file(session: requests.Session, url: str) -> Optional[requests.Response]:
     tries = 0
     while True:
         try:
-            r = session.get(url, timeout=90, stream=False)
+            # Body is left unread; callers pull it with read_capped().
+            if _is_httpx(session):
+                r = session.send(session.build_request("GET", url, timeout=90), stream=True)
+            else:
+                r = session.get(url, timeout=90, stream=True)
         except Exception:
             r = None
         if r and 200 <= r.status_code < 300:
             return r
+        if r is not None:
+            r.close()
         if r and r.status_code == 429:
             ra = float(r.headers.get("Retry-After", "1"))
             time.sleep(max(0.2, ra))
@@ -248,14 +402,148 @@ def get_file(session: requests.Session, url: str) -> Optional[requests.Response]
             return r
         tries += 1
 
+def read_capped(resp: requests.Response, cap: int, chunk: int = 65536) -> Optional[bytes]:
+    """Read a streamed body; None (and connection released) once it exceeds cap."""
+    buf = bytearray()
+    try:
+        parts = resp.iter_bytes(chunk) if hasattr(resp, "iter_bytes") else resp.iter_content(chunk)
+        for part in parts:
+            buf.extend(part)
+            if len(buf) > cap:
+                return None
+    finally:
+        resp.close()
+    return bytes(buf)
+
+# Small LRU of downloaded attachment bytes by URL: replies/forwards often
+# repeat the same CDN URL within one export. Bounded by entries and bytes.
+# Only successful downloads are cached, so a transient failure isn't repeated.
+_ATT_CACHE: "OrderedDict[str, bytes]" = OrderedDict()
+_ATT_CACHE_MAX_ENTRIES = 64
+_ATT_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_att_cache_bytes = 0
+_att_cache_lock = threading.Lock()
+
+def _att_cache_get(url: str) -> Optional[bytes]:
+    with _att_cache_lock:
+        blob = _ATT_CACHE.get(url)
+        if blob is not None:
+            _ATT_CACHE.move_to_end(url)
+        return blob
+
+def _att_cache_put(url: str, blob: bytes):
+    global _att_cache_bytes
+    if len(blob) > _ATT_CACHE_MAX_BYTES:
+        return
+    with _att_cache_lock:
+        old = _ATT_CACHE.pop(url, None)
+        _att_cache_bytes -= len(old) if old is not None else 0
+        _ATT_CACHE[url] = blob
+        _att_cache_bytes += len(blob)
+        while len(_ATT_CACHE) > _ATT_CACHE_MAX_ENTRIES or _att_cache_bytes > _ATT_CACHE_MAX_BYTES:
+            _u, ev = _ATT_CACHE.popitem(last=False)
+            _att_cache_bytes -= len(ev)
+
+def fetch_attachment(session: requests.Session, att: Dict[str, Any], size_cap: int) -> Tuple:
+    """
+    Download one attachment if it fits under size_cap.
+    Returns ("file", filename, content, ctype, url) or ("link", url).
+    """
+    url = att["url"]
+    blob = _att_cache_get(url)
+    if blob is not None and len(blob) <= size_cap:
+        return ("file", att["filename"], blob, att.get("content_type") or "application/octet-stream", url)
+    res = _fetch_attachment_uncached(session, att, size_cap)
+    if res[0] == "file":
+        _att_cache_put(url, res[2])
+    return res
+
+def _fetch_attachment_uncached(session: requests.Session, att: Dict[str, Any], size_cap: int) -> Tuple:
+    url = att["url"]
+    fn = att["filename"]  # already sanitized by normalize_export
+    ctype = att.get("content_type") or "application/octet-stream"
+    size_hint = int(att.get("size_hint") or 0)
+
+    if size_hint and size_hint > size_cap:
+        return ("link", url)
+
+    gr = get_file(session, url)
+    if not gr or not (200 <= gr.status_code < 300):
+        return ("link", url)
+
+    # No separate HEAD: the streamed GET's headers arrive before the body.
+    try:
+        declared = int(gr.headers.get("Content-Length") or "0")
+    except ValueError:
+        declared = 0
+    if declared > size_cap:
+        gr.close()
+        return ("link", url)
+
+    try:
+        content_bytes = read_capped(gr, size_cap)
+    except Exception:
+        content_bytes = None
+    if content_bytes is None:
+        return ("link", url)
+
+    return ("file", fn, content_bytes, ctype, url)
+
+# Long-lived fetch workers, so their thread-local sessions (and keep-alive
+# sockets) survive from one message to the next.
+_fetch_pool: Optional[ThreadPoolExecutor] = None
+_fetch_pool_lock = threading.Lock()
+
+def fetch_pool() -> ThreadPoolExecutor:
+    global _fetch_pool
+    with _fetch_pool_lock:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fetch")
+        return _fetch_pool
+
+def fetch_attachments(session: requests.Session, atts: List[Dict[str, Any]],
+                      size_cap: int) -> Tuple[List[Tuple[str, bytes, str, str]], List[str]]:
+    """
+    Fetch a message's attachments concurrently, order kept.
+    Each worker uses its own session; `session` is only shared if it is an httpx client.
+    Returns (downloadable [(filename, content, ctype, src_url)], link_lines ["Attachment: url"]).
+    """
+    downloadable: List[Tuple[str, bytes, str, str]] = []
+    link_lines: List[str] = []
+    if atts:
+        results = list(fetch_pool().map(
+            lambda a: fetch_attachment(thread_session(session), a, size_cap), atts))
+        for res in results:
+            if res[0] == "file":
+                downloadable.append(res[1:])
+            else:
+                link_lines.append(f"Attachment: {res[1]}")
+    return downloadable, link_lines
+
 # ----------------- Forwarding core -----------------
 
+def _payload(content: str, username: str, avatar_url: Optional[str], ref_id: Optional[str]) -> Dict[str, Any]:
+    p: Dict[str, Any] = {"content": content, "username": username}
+    if avatar_url:
+        p["avatar_url"] = avatar_url
+    if ref_id:
+        p["message_reference"] = {"message_id": ref_id, "fail_if_not_exists": False}
+    return p
+
+def _files_form(batch: List[Tuple[str, bytes, str, str]]) -> List[Tuple[str, Tuple[str, bytes, str]]]:
+    return [(f"files[{i}]", (fn, blob, ctype)) for i, (fn, blob, ctype, _url) in enumerate(batch)]
+
 def forward_message(session: requests.Session, webhook_url: str, message: Dict[str, Any],
                     id_map: Dict[str, str], size_cap: int, max_files_per_post: int,
-                    dry_run: bool, verbose: bool) -> Optional[str]:
+                    dry_run: bool, verbose: bool,
+                    fetched: Optional[Tuple[List[Tuple[str, bytes, str, str]], List[str]]] = None) -> Optional[str]:
     """
     Returns dest message id (first post) or None.
+    `fetched` is the fetch_attachments() result when it was prefetched.
     """
+    username = message["username"]
+    avatar_url = message.get("avatar_url")
+
     # Build content with optional manual quote if reply mapping not resolvable
     content = message["content"] or ""
     reply_to_id = message.get("reply_to_id")
@@ -268,173 +556,153 @@ def forward_message(session: requests.Session, webhook_url: str, message: Dict[s
         header = f"(replying to an earlier message)\n"
 
     chunks = chunk_text(header + content, 1900)
+    first_content = f"{chunks[0]} (part 1)" if len(chunks) > 1 else chunks[0]
 
-    base_payload: Dict[str, Any] = {
-        "content": f"{chunks[0]} (part 1)" if len(chunks) > 1 else chunks[0],
-        "username": message["username"],
-    }
-    if message.get("avatar_url"):
-        base_payload["avatar_url"] = message["avatar_url"]
-    if dest_reply_id:
-        base_payload["message_reference"] = {"message_id": dest_reply_id, "fail_if_not_exists": False}
-
-    # Decide attachments: download or link
-    downloadable: List[Tuple[str, bytes, str, str]] = []  # (filename, content, ctype, src_url)
-    link_only: List[str] = []
-
-    for att in message["attachments"]:
-        url = att["url"]
-        fn = sanitize_filename(att["filename"])
-        ctype = att.get("content_type") or "application/octet-stream"
-        size_hint = int(att.get("size_hint") or 0)
-
-        if not size_hint:
-            hr = head_file(session, url)
-            try:
-                if hr and 200 <= hr.status_code < 300:
-                    size_hint = int(hr.headers.get("Content-Length") or "0")
-            except Exception:
-                size_hint = 0
-
-        if size_hint and size_hint > size_cap:
-            link_only.append(url)
-            continue
-
-        gr = get_file(session, url)
-        if not gr or not (200 <= gr.status_code < 300):
-            link_only.append(url)
-            continue
-
-        content_bytes = gr.content
-        if len(content_bytes) > size_cap:
-            link_only.append(url)
-            continue
+    # Dry-run has no session: report without downloading anything
+    if dry_run:
+        print(f"[dry-run] Would POST content len={len(first_content)}, parts={len(chunks)}, "
+              f"attachments={len(message['attachments'])} (not fetched)")
+        return None
 
-        downloadable.append((fn, content_bytes, ctype, url))
+    # Decide attachments: download or link (unless the caller prefetched them)
+    if fetched is None:
+        fetched = fetch_attachments(session, message["attachments"], size_cap)
+    downloadable, link_lines = fetched
 
     # Link summary for any link-only attachments
-    link_suffix = ""
-    if link_only:
-        link_suffix = "\n" + "\n".join(f"Attachment: {u}" for u in link_only)
+    link_suffix = "\n" + "\n".join(link_lines) if link_lines else ""
 
-    # Send base post
-    if dry_run:
-        print(f"[dry-run] Would POST content len={len(base_payload['content'])}, files={min(len(downloadable), max_files_per_post)} (+{len(link_only)} links)")
-        return None
+    def build_payload(idx: int, prev_id: Optional[str]) -> Dict[str, Any]:
+        text = first_content + link_suffix if idx == 0 else f"{chunks[idx]} (part {idx + 1})"
+        return _payload(text, username, avatar_url, prev_id)
 
     dest_message_id: Optional[str] = None
-
-    if downloadable:
+    prev = dest_reply_id
+    for idx in range(len(chunks)):
+        is_first = idx == 0
         # First post can include up to max_files_per_post files
-        first_batch = downloadable[:max_files_per_post]
-        files_form = [(f"files[{i}]", (fn, blob, ctype)) for i, (fn, blob, ctype, _url) in enumerate(first_batch)]
-        payload = dict(base_payload)
-        payload["content"] = (payload["content"] + link_suffix) if link_suffix else payload["content"]
-
-        resp = post_webhook(session, webhook_url, payload, files_form, verbose)
+        files_form = _files_form(downloadable[:max_files_per_post]) if is_first and downloadable else None
+        resp = post_webhook(session, webhook_url, build_payload(idx, prev), files_form, verbose)
         try:
-            dest_message_id = resp.json().get("id")
+            new_id = resp.json().get("id")
         except Exception:
-            dest_message_id = None
-
-        # Remaining batches
-        remaining = downloadable[max_files_per_post:]
-        batch_idx = 2
-        while remaining:
-            batch = remaining[:max_files_per_post]
-            remaining = remaining[max_files_per_post:]
-
-            follow: Dict[str, Any] = {"content": f"(attachment batch {batch_idx})", "username": message["username"]}
-            if message.get("avatar_url"):
-                follow["avatar_url"] = message["avatar_url"]
-            if dest_message_id:
-                follow["message_reference"] = {"message_id": dest_message_id, "fail_if_not_exists": False}
-
-            files_form = [(f"files[{i}]", (fn, blob, ctype)) for i, (fn, blob, ctype, _u) in enumerate(batch)]
-            post_webhook(session, webhook_url, follow, files_form, verbose)
-            batch_idx += 1
-    else:
-        # No downloadable files – just text (and link_suffix)
-        payload = dict(base_payload)
-        payload["content"] = payload["content"] + link_suffix
+            new_id = None
+        if not is_first:
+            # Extra text chunks as chained replies
+            prev = new_id or prev
+            continue
 
-        resp = post_webhook(session, webhook_url, payload, None, verbose)
-        try:
-            dest_message_id = resp.json().get("id")
-        except Exception:
-            dest_message_id = None
-
-    # Extra text chunks as chained replies
-    prev = dest_message_id
-    for idx, extra in enumerate(chunks[1:], start=2):
-        extra_payload = {"content": f"{extra} (part {idx})", "username": message["username"]}
-        if message.get("avatar_url"):
-            extra_payload["avatar_url"] = message["avatar_url"]
-        if prev:
-            extra_payload["message_reference"] = {"message_id": prev, "fail_if_not_exists": False}
-        r = post_webhook(session, webhook_url, extra_payload, None, verbose)
-        try:
-            prev = r.json().get("id") or prev
-        except Exception:
-            pass
+        dest_message_id = prev = new_id
+        # Remaining attachment batches reply to the first post
+        for batch_idx, start in enumerate(range(max_files_per_post, len(downloadable), max_files_per_post), start=2):
+            follow = _payload(f"(attachment batch {batch_idx})", username, avatar_url, dest_message_id)
+            post_webhook(session, webhook_url, follow, _files_form(downloadable[start:start + max_files_per_post]), verbose)
 
     return dest_message_id
 
 # ----------------- CLI -----------------
 
-def main():
-    ap = argparse.ArgumentParser(description="Forward exported Discord messages to a webhook (once).")
-    ap.add_argument("--json", required=True, help="Path to DiscordChatExporter JSON")
-    ap.add_argument("--webhook", required=True, help="Destination Discord webhook URL")
-    ap.add_argument("--state", required=True, help="Path to state file to track seen IDs")
-    ap.add_argument("--id-map", required=True, help="Path to ID map (src_id -> dest_id) for replies")
-    ap.add_argument("--max-attach-mb", type=float, default=7.8, help="Max per-file upload size")
-    ap.add_argument("--max-files-per-post", type=int, default=8, help="Attachment batch size per message (<=10)")
-    ap.add_argument("--dry-run", action="store_true", help="Do not post; print actions instead")
-    ap.add_argument("--verbose", action="store_true", help="Verbose logs")
-    args = ap.parse_args()
+def forward_job(session: requests.Session, job: Dict[str, str], args) -> bool:
+    """
+    Forward one export (keys: json, webhook, state, id_map, optional emit_latest_ts).
+    Returns False if the export could not be read.
+    """
+    state = load_json(job["state"], default={})
+    seen: Dict[str, str] = state.get("seen_ids") or {}
+    id_map: Dict[str, str] = load_json(job["id_map"], default={})
 
-    # Load JSON
+    # Stream the export; only new messages are kept in memory.
+    stats: Dict[str, Any] = {"count": 0, "latest": None}
     try:
-        with open(args.json, "r", encoding="utf-8") as f:
-            export_obj = json.load(f)
+        new_msgs = list(normalize_export(tally_messages(stream_messages(job["json"]), stats),
+                                         skip_ids=seen.keys()))
     except Exception as e:
-        print(f"[error] Failed to read JSON: {e}", file=sys.stderr)
-        sys.exit(2)
+        print(f"[error] Failed to read JSON {job['json']}: {e}", file=sys.stderr)
+        return False
+    if args.verbose:
+        print(f"[info] messages_total={stats['count']} new={len(new_msgs)} seen={len(seen)}")
 
-    messages = normalize_export(export_obj)
+    size_cap = int(args.max_attach_mb * 1024 * 1024)
+    webhook = ensure_query_param(job["webhook"], "wait", "true")
 
-    state = load_json(args.state, default={})
-    seen: Dict[str, str] = state.get("seen_ids") or {}
-    id_map: Dict[str, str] = load_json(args.id_map, default={})
+    # Posts stay strictly in source order (the destination channel must read
+    # chronologically and replies need their parent's dest id), so only the
+    # next message's attachment downloads overlap the current message's posts.
+    prefetch = ThreadPoolExecutor(max_workers=2)
+    pending: Dict[int, Any] = {}
 
-    # Filter only new
-    new_msgs = [m for m in messages if m["id"] not in seen]
-    if args.verbose:
-        print(f"[info] messages_total={len(messages)} new={len(new_msgs)} seen={len(seen)}")
+    def _prefetch(i: int):
+        if not args.dry_run and i < len(new_msgs) and i not in pending:
+            pending[i] = prefetch.submit(fetch_attachments, session, new_msgs[i]["attachments"], size_cap)
 
-    size_cap = int(args.max_attach_mb * 1024 * 1024)
-    session = session_with_retries()
+    # Seen-marks only need run-level precision; format the timestamp once.
+    now_iso = iso_z(datetime.now(timezone.utc))
 
     sent = 0
-    for m in new_msgs:
+    for i, m in enumerate(new_msgs):
+        _prefetch(i)
+        _prefetch(i + 1)
+        fut = pending.pop(i, None)
         try:
-            dest_id = forward_message(session, args.webhook, m, id_map, size_cap,
+            dest_id = forward_message(session, webhook, m, id_map, size_cap,
                                       max(1, min(10, args.max_files_per_post)),
-                                      dry_run=args.dry_run, verbose=args.verbose)
-            seen[m["id"]] = iso_z(datetime.now(timezone.utc))
+                                      dry_run=args.dry_run, verbose=args.verbose,
+                                      fetched=fut.result() if fut else None)
+            seen[m["id"]] = now_iso
             if dest_id:
                 id_map[m["id"]] = dest_id
             sent += 1
         except Exception as e:
             print(f"[error] Failed to forward id={m['id']}: {e}", file=sys.stderr)
+    prefetch.shutdown()
 
     state["seen_ids"] = seen
     if not args.dry_run:
-        save_json(args.state, state)
-        save_json(args.id_map, id_map)
+        save_json(job["state"], state)
+        save_json(job["id_map"], id_map)
+
+    if job.get("emit_latest_ts"):
+        latest = stats["latest"]
+        if latest:
+            save_json(job["emit_latest_ts"], {"latest_iso": iso_z(latest)})
 
-    print(f"[forward] processed={len(messages)} forwarded_new={sent}{' (dry-run)' if args.dry_run else ''}")
+    print(f"[forward] processed={stats['count']} forwarded_new={sent}{' (dry-run)' if args.dry_run else ''}")
+    return True
+
+def main():
+    ap = argparse.ArgumentParser(description="Forward exported Discord messages to a webhook (once).")
+    ap.add_argument("--json", default="", help="Path to DiscordChatExporter JSON")
+    ap.add_argument("--webhook", default="", help="Destination Discord webhook URL")
+    ap.add_argument("--state", default="", help="Path to state file to track seen IDs")
+    ap.add_argument("--id-map", default="", help="Path to ID map (src_id -> dest_id) for replies")
+    ap.add_argument("--jobs-file", default="",
+                    help="JSON list of {json, webhook, state, id_map, emit_latest_ts} jobs to run in this process "
+                         "(replaces the four options above)")
+    ap.add_argument("--max-attach-mb", type=float, default=7.8, help="Max per-file upload size")
+    ap.add_argument("--max-files-per-post", type=int, default=8, help="Attachment batch size per message (<=10)")
+    ap.add_argument("--emit-latest-ts", default="", help="Write the export's latest message timestamp to this JSON file")
+    ap.add_argument("--http2", action="store_true",
+                    help="Use an HTTP/2 client (needs httpx[http2]); all requests share one multiplexed connection per host")
+    ap.add_argument("--dry-run", action="store_true", help="Do not post; print actions instead")
+    ap.add_argument("--verbose", action="store_true", help="Verbose logs")
+    args = ap.parse_args()
+
+    if args.jobs_file:
+        jobs = load_json(args.jobs_file, default=None)
+        if not isinstance(jobs, list):
+            print(f"[error] Failed to read jobs file: {args.jobs_file}", file=sys.stderr)
+            sys.exit(2)
+    else:
+        if not (args.json and args.webhook and args.state and args.id_map):
+            ap.error("--json, --webhook, --state and --id-map are required unless --jobs-file is given")
+        jobs = [{"json": args.json, "webhook": args.webhook, "state": args.state,
+                 "id_map": args.id_map, "emit_latest_ts": args.emit_latest_ts}]
+
+    # One session (and connection pool) for every job in this process.
+    session = None if args.dry_run else session_with_retries(args.http2)
+    failed = sum(1 for job in jobs if not forward_job(session, job, args))
+    if failed:
+        sys.exit(2)
 
 if __name__ == "__main__":
     main()
@@ -1,12 +1,32 @@
 import argparse
+import gzip
 import json
 import os
+import random
 import sys
+import threading
+import time
+from operator import itemgetter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone
-from typing import Dict, List, Any, Tuple, Optional
+from typing import Dict, List, Any, Tuple, Optional, Set, Union
 from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
 
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson  # optional: much faster export parse + payload encode
+except ImportError:
+    orjson = None
+
+try:
+    # optional: streams the multipart body from the parts instead of
+    # requests first concatenating every file into one in-memory body
+    from requests_toolbelt.multipart.encoder import MultipartEncoder
+except ImportError:
+    MultipartEncoder = None
 
 # ----------------- Helpers -----------------
 
@@ -14,18 +34,74 @@ def load_json(path: str, default):
     if not path or not os.path.exists(path):
         return default
     try:
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+        return read_json_file(path)
     except Exception:
         return default
 
-def save_json(path: str, data: Any):
+def read_json_file(path: str) -> Any:
+    if orjson is not None:
+        with open(path, "rb") as f:
+            return orjson.loads(f.read())
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def dumps_json(data: Any) -> str:
+    # orjson emits UTF-8 without ASCII escaping, same as ensure_ascii=False.
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False)
+
+def save_json(path: str, data: Any, durable: bool = False):
     os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
     tmp = path + ".tmp"
     with open(tmp, "w", encoding="utf-8") as f:
         json.dump(data, f, ensure_ascii=False, indent=2)
+        if durable:
+            # Data on disk before the rename makes it visible.
+            f.flush()
+            os.fsync(f.fileno())
     os.replace(tmp, path)
 
+# Append-only journal next to a snapshot (<path>.jsonl): one line per
+# forwarded message ([key, value] for a dict, the bare key for a set), so a
+# crash mid-run keeps its progress without rewriting the whole snapshot each
+# time. Folded into the snapshot every CHECKPOINT_EVERY forwards and at exit.
+CHECKPOINT_EVERY = 100
+
+def journal_path(path: str) -> str:
+    return path + ".jsonl"
+
+def replay_journal(path: str, into: Union[Dict[str, Any], Set[str]]) -> int:
+    jpath = journal_path(path)
+    if not os.path.exists(jpath):
+        return 0
+    n = 0
+    with open(jpath, "rb") as f:
+        for line in f:
+            try:
+                rec = orjson.loads(line) if orjson is not None else json.loads(line)
+                if isinstance(into, set):
+                    into.add(rec[0] if isinstance(rec, list) else rec)
+                else:
+                    k, v = rec
+                    into[k] = v
+            except Exception:
+                continue  # torn last line after a crash
+            n += 1
+    return n
+
+def open_journal(path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    return open(journal_path(path), "a", encoding="utf-8", buffering=1)  # line-buffered
+
+def compact_journal(path: str, snapshot: Any, durable: bool = False):
+    # Snapshot first: replaying a stale journal onto it again is harmless.
+    save_json(path, snapshot, durable)
+    try:
+        os.remove(journal_path(path))
+    except FileNotFoundError:
+        pass
+
 def iso_z(dt: datetime) -> str:
     if dt.tzinfo is None:
         dt = dt.replace(tzinfo=timezone.utc)
@@ -50,69 +126,45 @@ def first_n(s: str, n: int) -> str:
     s = s or ""
     return (s[:n] + "…") if len(s) > n else s
 
-# Added helpers: chunking + author/index for manual quote lookup
-def chunk_text(s: str, limit: int = 1900) -> List[str]:
+# Added helpers: chunking
+DISCORD_CONTENT_MAX = 2000
+
+def chunk_text(s: str, limit: int = DISCORD_CONTENT_MAX) -> List[str]:
     """
-    Split text into safe chunks below Discord's 2000-char cap.
-    Keep headroom for quotes/prefixes.
+    Split text into as few chunks as fit Discord's content cap.
+    The first chunk is posted as-is; later ones get a " (part N)" suffix,
+    so each is packed to exactly limit minus that suffix.
+    Quote lines/links are already part of s when this is called.
     """
     s = s or ""
-    if not s:
-        return [""]
-    out = []
-    i = 0
+    if len(s) <= limit:
+        return [s]
+    out = [s[:limit]]
+    i = limit
     while i < len(s):
-        out.append(s[i:i+limit])
-        i += limit
+        room = limit - len(f" (part {len(out) + 1})")
+        out.append(s[i:i+room])
+        i += room
     return out
 
-def author_name(author: dict) -> str:
-    if not isinstance(author, dict):
-        return "Unknown"
-    return author.get("nickname") or author.get("name") or author.get("username") or "Unknown"
-
-def build_id_index(messages: list) -> Dict[str, Dict[str, Any]]:
-    idx = {}
-    for m in messages or []:
-        mid = str(m.get("id") or "")
-        if not mid:
-            continue
-        try:
-            content = (m.get("content") or "").strip()
-        except Exception:
-            content = ""
-        try:
-            a = author_name(m.get("author") or {})
-        except Exception:
-            a = "Unknown"
-        idx[mid] = {"author": a, "content": content, "timestamp": m.get("timestamp")}
-    return idx
-
 # ----------------- Export normalization -----------------
 
 def extract_reply_reference(msg: Dict[str, Any]) -> Optional[str]:
-    # Try exporter styles
-    # 1) 'reference' style
+    # Exporter styles: 'reference' {messageId|message_id|id}, 'referencedMessage' {id},
+    # 'repliesTo'/'replies_to' {id}. First hit wins.
     ref = msg.get("reference")
+    r = msg.get("referencedMessage")
+    r2 = msg.get("repliesTo") or msg.get("replies_to")
+    if not (ref or r or r2):
+        return None  # not a reply: the common case
+    m = None
     if isinstance(ref, dict):
-        # direct reply reference style
         m = ref.get("messageId") or ref.get("message_id") or ref.get("id")
-        if m:
-            return str(m)
-    # 2) 'referencedMessage' style
-    r = msg.get("referencedMessage")
-    if isinstance(r, dict):
+    if not m and isinstance(r, dict):
         m = r.get("id")
-        if m:
-            return str(m)
-    # 3) some exports store 'repliesTo'
-    r2 = msg.get("repliesTo") or msg.get("replies_to")
-    if isinstance(r2, dict):
+    if not m and isinstance(r2, dict):
         m = r2.get("id")
-        if m:
-            return str(m)
-    # 4) none
-    return None
+    return str(m) if m else None
 
 def batch_list(lst: list, n: int) -> List[list]:
     return [lst[i:i+n] for i in range(0, len(lst), n)]
@@ -124,21 +176,47 @@ def build_payload_base(message: Dict[str, Any]) -> Dict[str, Any]:
     }
     if message.get("avatar_url"):
         payload["avatar_url"] = message["avatar_url"]
-    if message.get("embeds"):
-        try:
-            json.dumps(message["embeds"])
-            payload["embeds"] = message["embeds"]
-        except Exception:
-            pass
+    # Embeds come straight from parsed exporter JSON, so they always re-serialize;
+    # a type check replaces the trial dumps().
+    embeds = message.get("embeds")
+    if embeds and isinstance(embeds, list):
+        payload["embeds"] = embeds
     return payload
 
-def normalize_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+def webhook_username(author: Any, cache: Optional[Dict[tuple, str]] = None) -> str:
+    """Display name clamped to the webhook cap, memoized per (nickname, name, username)."""
+    if not isinstance(author, dict):
+        return "Unknown"
+    key = (author.get("nickname"), author.get("name"), author.get("username"))
+    if cache is not None:
+        username = cache.get(key)
+        if username is not None:
+            return username
+    username = clamp_webhook_username(key[0] or key[1] or key[2] or "Unknown")
+    if cache is not None:
+        cache[key] = username
+    return username
+
+def ts_epoch_ms(ts: Optional[str]) -> int:
+    # Integer sort key; unparsable/missing/non-string timestamps sort first (as "" did).
+    # Naive values are read as UTC, not local time.
+    if not isinstance(ts, str) or not ts:
+        return 0
+    try:
+        dt = datetime.fromisoformat(ts.replace("Z", "+00:00"))
+    except ValueError:
+        return 0
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def normalize_message(msg: Dict[str, Any], author_cache: Optional[Dict[tuple, str]] = None) -> Dict[str, Any]:
     # Some exporter formats vary; normalize to a minimal shape we use later.
     m_id = str(msg.get("id"))
     ts = msg.get("timestamp")
     content = msg.get("content") or ""
     author = msg.get("author") or {}
-    username = author.get("nickname") or author.get("name") or author.get("username") or "Unknown"
+    username = webhook_username(author, author_cache)
     avatar_url = author.get("avatarUrl") or author.get("avatar_url") or None
 
     # attachments (download URLs + filename + contentType)
@@ -146,7 +224,10 @@ def normalize_message(msg: Dict[str, Any]) -> Dict[str, Any]:
     for a in msg.get("attachments") or []:
         url = a.get("url") or a.get("proxy_url")
         if url:
-            size_hint = a.get("size") or a.get("fileSize") or 0
+            # None = unknown (checked from the GET's Content-Length); 0 is a real size
+            size_hint = a.get("size")
+            if size_hint is None:
+                size_hint = a.get("fileSize")
             attachments.append({
                 "url": url,
                 "filename": a.get("fileName") or a.get("filename") or os.path.basename(url),
@@ -160,22 +241,23 @@ def normalize_message(msg: Dict[str, Any]) -> Dict[str, Any]:
     refmsg = msg.get("referencedMessage")
     ref_preview = None
     if isinstance(refmsg, dict):
-        rauthor = (refmsg.get("author") or {})
-        rname = rauthor.get("nickname") or rauthor.get("name") or "Unknown"
-        rcontent = refmsg.get("content") or ""
+        rauthor = refmsg.get("author")
+        rname = (rauthor.get("nickname") or rauthor.get("name") or "Unknown") if isinstance(rauthor, dict) else "Unknown"
+        rcontent = refmsg.get("content")
         rts = refmsg.get("timestamp")
         ref_preview = {
             "id": str(refmsg.get("id")) if refmsg.get("id") else None,
             "author": rname,
-            "content": first_n(rcontent.strip(), 180),
+            "content": first_n(rcontent.strip() if isinstance(rcontent, str) else "", 180),
             "timestamp": rts
         }
 
     return {
         "id": m_id,
         "timestamp": ts,
+        "ts_epoch": ts_epoch_ms(ts),
         "content": content,
-        "username": username[:80],  # webhook username cap
+        "username": username,  # already clamped to the webhook username cap
         "avatar_url": avatar_url,
         "attachments": attachments,
         "embeds": embeds,
@@ -184,26 +266,226 @@ def normalize_message(msg: Dict[str, Any]) -> Dict[str, Any]:
         "jump_url": msg.get("url") or msg.get("jumpUrl") or None,
     }
 
+def reply_layers(messages: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+    """
+    Group time-sorted messages into waves for parallel forwarding: a reply goes
+    one wave after its parent when the parent is in this batch, so the parent's
+    dest id is in id_map before the reply is posted. Order is kept inside a wave.
+    """
+    layer_of: Dict[str, int] = {}
+    layers: List[List[Dict[str, Any]]] = []
+    for m in messages:
+        parent = m.get("reply_to_id")
+        lvl = layer_of[parent] + 1 if parent in layer_of else 0
+        layer_of[m["id"]] = lvl
+        if lvl == len(layers):
+            layers.append([])
+        layers[lvl].append(m)
+    return layers
+
 # ----------------- HTTP -----------------
 
-def post_webhook(session: requests.Session, webhook_url: str, payload: Dict[str, Any], files: Optional[List[Tuple[str, Tuple[str, bytes, str]]]] = None) -> requests.Response:
-    wh = ensure_query_param(webhook_url, "wait", "true")
-    headers = {"Content-Type": "application/json"} if not files else None
+def make_session() -> requests.Session:
+    sess = requests.Session()
+    # Bigger keep-alive pool for discord.com + CDN so concurrent fetches don't
+    # reopen TLS connections. Retry only covers idempotent HEAD/GET (urllib3
+    # never retries POST by default), so webhook posts are never duplicated.
+    retry = Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504],
+                  raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=32, pool_maxsize=64, max_retries=retry)
+    sess.mount("https://", adapter)
+    sess.mount("http://", adapter)
+    sess.headers.update({"Connection": "keep-alive", "Accept-Encoding": "gzip, deflate"})
+    return sess
+
+# One session per thread (requests.Session isn't thread-safe): forward
+# workers and attachment fetchers each reuse their own connection pool.
+_local = threading.local()
+
+def thread_session() -> requests.Session:
+    sess = getattr(_local, "sess", None)
+    if sess is None:
+        sess = _local.sess = make_session()
+    return sess
+
+# With --gzip, JSON bodies above this many bytes are sent gzip-compressed
+# (Content-Encoding); small ones aren't worth the CPU. Off by default: a
+# webhook that rejects compressed bodies (400/415) gets the post resent
+# uncompressed and isn't sent gzip again for the rest of the process.
+GZIP_MIN_BYTES = 1024
+_no_gzip: Set[str] = set()
+
+# Bucket refill time per webhook URL, shared by all forward workers: once one
+# post drains the bucket (or eats a 429), every worker waits it out.
+_rl_reset: Dict[str, float] = {}
+_rl_lock = threading.Lock()
+
+def _sleep_backoff(i: int, base: float = 0.8, cap: float = 10.0):
+    # exponential backoff with full jitter, so concurrent retries don't line up
+    time.sleep(random.uniform(0, min(cap, base * (1 << i))))
+
+def _note_rate_limit(webhook_url: str, resp: requests.Response):
+    delay = 0.0
+    if resp.status_code == 429:
+        try:
+            delay = float(resp.headers.get("Retry-After") or resp.json().get("retry_after") or 1)
+        except Exception:
+            delay = 1.0
+        delay = max(0.2, delay)
+    elif resp.headers.get("X-RateLimit-Remaining") == "0":
+        try:
+            delay = float(resp.headers.get("X-RateLimit-Reset-After") or "0")
+        except ValueError:
+            delay = 0.0
+    if delay > 0:
+        with _rl_lock:
+            _rl_reset[webhook_url] = max(_rl_reset.get(webhook_url, 0.0), time.monotonic() + delay)
+
+def _wait_for_rate_limit(webhook_url: str):
+    with _rl_lock:
+        reset = _rl_reset.get(webhook_url, 0.0)
+    delay = reset - time.monotonic()
+    if delay > 0:
+        time.sleep(delay)
+
+def _send(session: requests.Session, wh: str, payload: Dict[str, Any],
+          files: Optional[List[Tuple[str, Tuple[str, bytes, str]]]], use_gzip: bool = False) -> requests.Response:
     if files:
-        return session.post(wh, data={"payload_json": json.dumps(payload, ensure_ascii=False)}, files=files, timeout=60)
-    return session.post(wh, json=payload, timeout=30)
+        if MultipartEncoder is not None:
+            # Rebuilt per attempt: the encoder is a one-shot stream.
+            form = MultipartEncoder(fields=[("payload_json", dumps_json(payload))] + list(files))
+            return session.post(wh, data=form, headers={"Content-Type": form.content_type}, timeout=60)
+        return session.post(wh, data={"payload_json": dumps_json(payload)}, files=files, timeout=60)
+    body = orjson.dumps(payload) if orjson is not None else dumps_json(payload).encode("utf-8")
+    headers = {"Content-Type": "application/json"}
+    if use_gzip and wh not in _no_gzip and len(body) > GZIP_MIN_BYTES:
+        resp = session.post(wh, data=gzip.compress(body, compresslevel=1),
+                            headers={**headers, "Content-Encoding": "gzip"}, timeout=30)
+        if resp.status_code not in (400, 415):
+            return resp
+        _no_gzip.add(wh)
+        print("[warn] webhook rejected a gzip body; resending uncompressed", file=sys.stderr)
+    return session.post(wh, data=body, headers=headers, timeout=30)
+
+def post_webhook(session: requests.Session, webhook_url: str, payload: Dict[str, Any], files: Optional[List[Tuple[str, Tuple[str, bytes, str]]]] = None,
+                 use_gzip: bool = False) -> requests.Response:
+    """
+    POST with 429 (Retry-After, shared per webhook) and 5xx/network retries.
+    Raises requests.HTTPError on a final non-2xx, so the caller doesn't record
+    the message as forwarded.
+    """
+    wh = ensure_query_param(webhook_url, "wait", "true")
+    tries = 0
+    while True:
+        _wait_for_rate_limit(wh)
+        try:
+            resp = _send(session, wh, payload, files, use_gzip)
+        except requests.RequestException:
+            if tries >= 5:
+                raise
+            _sleep_backoff(tries)
+            tries += 1
+            continue
+
+        _note_rate_limit(wh, resp)
+        if resp.status_code == 429 and tries < 8:
+            tries += 1
+            continue
+        if 500 <= resp.status_code < 600 and tries < 5:
+            _sleep_backoff(tries)
+            tries += 1
+            continue
+        resp.raise_for_status()
+        return resp
 
-def head_file(session: requests.Session, url: str) -> Optional[requests.Response]:
+def get_file(session: requests.Session, url: str) -> Optional[requests.Response]:
     try:
-        return session.head(url, timeout=15, allow_redirects=True)
+        # Body is left unread; callers pull it with read_capped().
+        return session.get(url, timeout=60, stream=True)
     except Exception:
         return None
 
-def get_file(session: requests.Session, url: str) -> Optional[requests.Response]:
+def read_capped(resp: requests.Response, cap: int, chunk: int = 65536) -> Optional[bytes]:
+    """Read a streamed body in chunks; None as soon as it exceeds cap (rest is never downloaded)."""
+    buf = bytearray()
     try:
-        return session.get(url, timeout=60, stream=False)
+        for part in resp.iter_content(chunk):
+            buf.extend(part)
+            if len(buf) > cap:
+                return None
+    finally:
+        resp.close()
+    return bytes(buf)
+
+def fetch_one(att: Dict[str, Any], size_cap: int) -> Tuple:
+    """
+    GET one attachment on this thread's session.
+    Returns ("file", filename, content, content_type, url) or ("link", url).
+    """
+    session = thread_session()
+    url = att["url"]
+    filename = att["filename"]
+    ctype = att.get("content_type") or "application/octet-stream"
+
+    # Exporter size is known for almost every attachment: no request needed
+    size_hint = att.get("size_hint")
+    if size_hint is not None and size_hint > size_cap:
+        return ("link", url)
+
+    # Try to GET (re-upload). No HEAD probe for unknown sizes: the streamed
+    # GET's headers arrive before the body, so Content-Length is checked there.
+    gr = get_file(session, url)
+    if gr is None:
+        return ("link", url)
+    if (gr.status_code // 100) != 2:
+        gr.close()
+        return ("link", url)
+    try:
+        declared = int(gr.headers.get("Content-Length") or "0")
+    except ValueError:
+        declared = 0
+    if declared > size_cap:
+        gr.close()
+        return ("link", url)
+    try:
+        content = read_capped(gr, size_cap)
     except Exception:
-        return None
+        content = None
+    if content is None:
+        return ("link", url)
+
+    return ("file", filename, content, ctype, url)
+
+# Long-lived so its threads (and their sessions' keep-alive sockets) are
+# reused across messages; shared by all forward workers.
+_fetch_pool: Optional[ThreadPoolExecutor] = None
+_fetch_pool_lock = threading.Lock()
+
+def fetch_pool() -> ThreadPoolExecutor:
+    global _fetch_pool
+    with _fetch_pool_lock:
+        if _fetch_pool is None:
+            _fetch_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="fetch")
+        return _fetch_pool
+
+def fetch_attachments(attachments: List[Dict[str, Any]], size_cap: int) -> Tuple[List[Tuple[str, bytes, str, str]], List[str]]:
+    """
+    Fetch all attachments of one message concurrently (order kept), so the
+    fan-out costs about the slowest download rather than the sum of them.
+    Returns (downloadable [(filename, content, content_type, url)], link_only_urls).
+    """
+    downloadable_files: List[Tuple[str, bytes, str, str]] = []  # (filename, content, content_type, source_url)
+    link_only_urls: List[str] = []
+    if len(attachments) > 1:
+        results = list(fetch_pool().map(lambda a: fetch_one(a, size_cap), attachments))
+    else:
+        results = [fetch_one(a, size_cap) for a in attachments]
+    for res in results:
+        if res[0] == "file":
+            downloadable_files.append(res[1:])
+        else:
+            link_only_urls.append(res[1])
+    return downloadable_files, link_only_urls
 
 # ----------------- Forwarding -----------------
 
@@ -215,18 +497,30 @@ def forward_one_message(
     max_files_per_post: int,
     id_map: Dict[str, str],
     id_index: Optional[Dict[str, Dict[str, Any]]] = None,
+    use_gzip: bool = False,
 ) -> str:
     """
     Forward a single exporter message.
     Returns the destination message ID (for id_map).
+    Only a failed first post raises; once it landed, failed follow-up posts
+    (text parts, extra attachment batches) are logged and skipped, so the
+    caller still records the message and the first post is never repeated.
     """
     size_cap = int(max_attach_mb * 1024 * 1024)
 
+    def _follow_up(payload: Dict[str, Any], files=None) -> Optional[requests.Response]:
+        try:
+            return post_webhook(session, webhook_url, payload, files, use_gzip)
+        except requests.RequestException as e:
+            print(f"[warn] Follow-up post for id={message['id']} failed: {e}; not retried", file=sys.stderr)
+            return None
+
     # Build base payload
     base_payload = build_payload_base(message)
 
     # If this is a reply and we know the parent's DEST id, create a real reply.
     # Otherwise, prepend a manual quote line as fallback.
+    qp_line = None
     dest_parent_id = None
     source_parent_id = message.get("reply_to_id")
     if source_parent_id:
@@ -252,206 +546,231 @@ def forward_one_message(
             qp_line = f'> Quote {qp_author}: "{first_n(qp_content, 180)}"'
             if message.get("jump_url"):
                 qp_line += f"\n> {message['jump_url']}"
-            content = (base_payload.get("content") or "").strip()
-            base_payload["content"] = (qp_line + ("\n\n" + content if content else "")).strip()
 
-    # Decide per attachment whether to re-upload or just link
-    downloadable_files: List[Tuple[str, bytes, str, str]] = []  # (filename, content, content_type, source_url)
-    link_only_urls: List[str] = []
-    for att in message["attachments"]:
-        url = att["url"]
-        filename = att["filename"]
-        ctype = att.get("content_type") or "application/octet-stream"
-
-        # HEAD to get size if not provided
-        size_hint = att.get("size_hint") or 0
-        try:
-            if not size_hint:
-                hr = head_file(session, url)
-                if hr and (hr.status_code // 100) == 2:
-                    size_hint = int(hr.headers.get("Content-Length") or "0")
-        except Exception:
-            size_hint = 0
-
-        if size_hint and size_hint > size_cap:
-            link_only_urls.append(url)
-            continue
-
-        # Try to GET (re-upload)
-        gr = get_file(session, url)
-        if not gr or (gr.status_code // 100) != 2:
-            link_only_urls.append(url)
-            continue
-        content = gr.content
-        if len(content) > size_cap:
-            link_only_urls.append(url)
-            continue
-
-        downloadable_files.append((filename, content, ctype, url))
+    # Decide per attachment whether to re-upload or just link (fetched concurrently)
+    downloadable_files, link_only_urls = fetch_attachments(message["attachments"], size_cap)
 
+    # --- Assemble the final text once (quote, content, links), then chunk it
+    content_full = (message["content"] or "").strip()
+    if qp_line:
+        content_full = qp_line + ("\n\n" + content_full if content_full else "")
     if link_only_urls:
         links_text = "\n".join(f"[Attachment too large] {u}" for u in link_only_urls)
-        base_payload["content"] = (base_payload.get("content") or "").strip()
-        base_payload["content"] = (base_payload["content"] + ("\n" if base_payload["content"] else "") + links_text).strip()
-
-    # --- Chunk long content safely
-    content_full = base_payload.get("content") or ""
-    chunks = chunk_text(content_full, 1900)
-    base_payload["content"] = chunks[0]
-
+        content_full = content_full + ("\n" if content_full else "") + links_text
     # --- Empty-message handling
-    content_now = (base_payload.get("content") or "").strip()
-    embeds_now = base_payload.get("embeds") or []
-    has_files = bool(downloadable_files)
-    has_links = bool(link_only_urls)
-    if (not content_now) and (not embeds_now) and (not has_files) and (not has_links):
-        base_payload["content"] = "[no text]"
+    if not content_full and not base_payload.get("embeds") and not downloadable_files:
+        content_full = "[no text]"
+    chunks = chunk_text(content_full)
+    base_payload["content"] = chunks[0]
 
     # Send text + first batch of files
     files_form = []
-    dest_message_id = None
-    if downloadable_files:
-        first_batch = downloadable_files[:max_files_per_post]
-        for idx, (fn, content, ctype, _url) in enumerate(first_batch):
-            files_form.append((f"files[{idx}]", (fn, content, ctype)))
-        resp = post_webhook(session, webhook_url, base_payload, files_form)
+    for idx, (fn, content, ctype, _url) in enumerate(downloadable_files[:max_files_per_post]):
+        files_form.append((f"files[{idx}]", (fn, content, ctype)))
+    resp = post_webhook(session, webhook_url, base_payload, files_form or None, use_gzip)
+    try:
+        dest_message_id = resp.json().get("id")
+    except Exception:
+        dest_message_id = None
+
+    # Post remaining text chunks as chained replies (if any)
+    prev_id = dest_message_id
+    for idx_chunk, extra in enumerate(chunks[1:], start=2):
+        extra_payload = {"content": f"{extra} (part {idx_chunk})", "username": message["username"]}
+        if message.get("avatar_url"):
+            extra_payload["avatar_url"] = message["avatar_url"]
+        if prev_id:
+            extra_payload["message_reference"] = {"message_id": prev_id, "fail_if_not_exists": False}
+        resp2 = _follow_up(extra_payload)
+        if resp2 is None:
+            continue
         try:
-            dest_message_id = resp.json().get("id")
+            prev_id = resp2.json().get("id") or prev_id
         except Exception:
-            dest_message_id = None
+            pass
 
-        # Post remaining text chunks as chained replies (if any)
-        prev_id = dest_message_id
-        for idx_chunk, extra in enumerate(chunks[1:], start=2):
-            extra_payload = {"content": f"{extra} (part {idx_chunk})", "username": message["username"]}
+    # Any remaining files → additional posts (optionally as replies to first message if we got its ID)
+    remaining = downloadable_files[max_files_per_post:]
+    if remaining:
+        for batch_idx, batch in enumerate(batch_list(remaining, max_files_per_post), start=1):
+            follow_payload = {
+                "content": f"(attachment batch {batch_idx}/{(len(remaining)+max_files_per_post-1)//max_files_per_post}) from original message {message['id']}",
+                "username": message["username"],
+            }
             if message.get("avatar_url"):
-                extra_payload["avatar_url"] = message["avatar_url"]
-            if prev_id:
-                extra_payload["message_reference"] = {"message_id": prev_id, "fail_if_not_exists": False}
-            resp2 = post_webhook(session, webhook_url, extra_payload, files=None)
-            try:
-                prev_id = resp2.json().get("id") or prev_id
-            except Exception:
-                pass
-
-        # Any remaining files → additional posts (optionally as replies to first message if we got its ID)
-        remaining = downloadable_files[max_files_per_post:]
-        if remaining:
-            for batch_idx, batch in enumerate(batch_list(remaining, max_files_per_post), start=1):
-                follow_payload = {
-                    "content": f"(attachment batch {batch_idx}/{(len(remaining)+max_files_per_post-1)//max_files_per_post}) from original message {message['id']}",
-                    "username": message["username"],
+                follow_payload["avatar_url"] = message["avatar_url"]
+            if dest_message_id:
+                follow_payload["message_reference"] = {
+                    "message_id": dest_message_id,
+                    "fail_if_not_exists": False
                 }
-                if message.get("avatar_url"):
-                    follow_payload["avatar_url"] = message["avatar_url"]
-                if dest_message_id:
-                    follow_payload["message_reference"] = {
-                        "message_id": dest_message_id,
-                        "fail_if_not_exists": False
-                    }
-                files_form = []
-                for idx, (fn, content, ctype, _url) in enumerate(batch):
-                    files_form.append((f"files[{idx}]", (fn, content, ctype)))
-                post_webhook(session, webhook_url, follow_payload, files_form)
-    else:
-        # No files → single post
-        resp = post_webhook(session, webhook_url, base_payload, None)
-        try:
-            dest_message_id = resp.json().get("id")
-        except Exception:
-            dest_message_id = None
-
-        # Post remaining text chunks as chained replies (if any)
-        prev_id = dest_message_id
-        for idx_chunk, extra in enumerate(chunks[1:], start=2):
-            extra_payload = {"content": f"{extra} (part {idx_chunk})", "username": message["username"]}
-            if message.get("avatar_url"):
-                extra_payload["avatar_url"] = message["avatar_url"]
-            if prev_id:
-                extra_payload["message_reference"] = {"message_id": prev_id, "fail_if_not_exists": False}
-            resp2 = post_webhook(session, webhook_url, extra_payload, files=None)
-            try:
-                prev_id = resp2.json().get("id") or prev_id
-            except Exception:
-                pass
+            files_form = []
+            for idx, (fn, content, ctype, _url) in enumerate(batch):
+                files_form.append((f"files[{idx}]", (fn, content, ctype)))
+            _follow_up(follow_payload, files_form)
 
     return dest_message_id or ""
 
 # ----------------- Main -----------------
 
-def main():
-    ap = argparse.ArgumentParser(description="Forward new messages from a DiscordChatExporter JSON to a Discord webhook with replies/quotes and attachment size caps.")
-    ap.add_argument("--webhook", required=True, help="Destination Discord webhook URL")
-    ap.add_argument("--json", required=True, help="Path to the JSON file exported this run")
-    ap.add_argument("--state", required=True, help="Path to persistent state.json for dedupe")
-    ap.add_argument("--id-map", default="id_map.json", help="Path to persistent source->dest message ID map (per channel recommended)")
-    ap.add_argument("--max-attach-mb", type=float, default=25.0, help="Max size to re-upload (MB). Too-large files are posted as links.")
-    ap.add_argument("--max-files-per-post", type=int, default=10, help="Max files per webhook post (Discord limit = 10).")
-    args = ap.parse_args()
-
-    if not os.path.exists(args.json):
-        print(f"[error] JSON file not found: {args.json}", file=sys.stderr)
-        sys.exit(1)
+def run(webhook: str, json_path: str, state_path: str, id_map_path: str,
+        max_attach_mb: float = 25.0, max_files_per_post: int = 10, concurrency: int = 1,
+        use_gzip: bool = False) -> Tuple[int, int]:
+    """
+    Forward new messages from one export; returns (processed, forwarded_new).
+    Raises RuntimeError if the export can't be read. Safe to call repeatedly in
+    one process (orchestrate_one does, per window): sessions and the fetch
+    pool are reused across calls.
+    """
+    if not os.path.exists(json_path):
+        raise RuntimeError(f"JSON file not found: {json_path}")
 
     # Load exporter JSON
     try:
-        with open(args.json, "r", encoding="utf-8") as f:
-            exported = json.load(f)
+        exported = read_json_file(json_path)
     except Exception as e:
-        print(f"[error] Failed to read JSON {args.json}: {e}", file=sys.stderr)
-        sys.exit(1)
+        raise RuntimeError(f"Failed to read JSON {json_path}: {e}") from e
 
     msgs = exported.get("messages") if isinstance(exported, dict) else exported
     if not isinstance(msgs, list):
-        print("[error] Unexpected exporter JSON structure (missing 'messages' array).", file=sys.stderr)
-        sys.exit(1)
-
-    # Build id index for manual quote lookups
-    id_index = build_id_index(msgs)
-
-    normalized = [normalize_message(m) for m in msgs if m.get("id")]
-    normalized.sort(key=lambda m: (m.get("timestamp") or "", m["id"]))
+        raise RuntimeError("Unexpected exporter JSON structure (missing 'messages' array).")
+
+    # Normalize and build the id index (for manual quote lookups) in one pass
+    normalized: List[Dict[str, Any]] = []
+    id_index: Dict[str, Dict[str, Any]] = {}
+    author_cache: Dict[tuple, str] = {}  # a channel has few distinct authors
+    for m in msgs:
+        if not m.get("id"):
+            continue
+        nm = normalize_message(m, author_cache)
+        normalized.append(nm)
+        c = nm["content"]
+        id_index[nm["id"]] = {"author": nm["username"], "content": c.strip() if isinstance(c, str) else "",
+                              "timestamp": nm["timestamp"]}
+    normalized.sort(key=itemgetter("ts_epoch", "id"))
 
     # Load persistent state: seen source IDs (dedupe)
-    state = load_json(args.state, {})
-    seen: Dict[str, str] = state.get("seen_ids") or {}
+    state = load_json(state_path, {})
+    # Only presence matters; older state files stored {id: seen_at} (keys are kept).
+    seen: Set[str] = set(state.get("seen_ids") or ())
 
     # Load id_map: source message id -> dest message id (for real reply threading)
-    id_map: Dict[str, str] = load_json(args.id_map, {})
+    id_map: Dict[str, str] = load_json(id_map_path, {})
 
-    # Session
-    sess = requests.Session()
-    # Ensure we get a synchronous response so we can read new dest IDs
-    webhook = ensure_query_param(args.webhook, "wait", "true")
+    # Progress journaled by a run that didn't finish
+    recovered = replay_journal(state_path, seen) + replay_journal(id_map_path, id_map)
+    if recovered:
+        print(f"[info] recovered {recovered} journal entries from an interrupted run")
 
+    # Ensure we get a synchronous response so we can read new dest IDs
+    webhook = ensure_query_param(webhook, "wait", "true")
+
+    def _forward(m: Dict[str, Any]) -> str:
+        return forward_one_message(
+            session=thread_session(),
+            webhook_url=webhook,
+            message=m,
+            max_attach_mb=max_attach_mb,
+            max_files_per_post=max_files_per_post,
+            id_map=id_map,
+            id_index=id_index,
+            use_gzip=use_gzip,
+        )
+
+    # Deduplicate by source id
+    pending = [m for m in normalized if m["id"] not in seen]
+
+    # Seen-marks only need run-level precision: one timestamp per run.
+    now_iso = iso_z(datetime.now(timezone.utc))
     sent_count = 0
-    for m in normalized:
-        # Deduplicate by source id
-        if m["id"] in seen:
-            continue
-
-        try:
-            dest_id = forward_one_message(
-                session=sess,
-                webhook_url=webhook,
-                message=m,
-                max_attach_mb=args.max_attach_mb,
-                max_files_per_post=args.max_files_per_post,
-                id_map=id_map,
-                id_index=id_index,
-            )
-            # Mark as seen regardless (avoid repeats). Save mapping if we got a dest id.
-            seen[m["id"]] = iso_z(datetime.now(timezone.utc))
-            if dest_id:
-                id_map[m["id"]] = dest_id
-            sent_count += 1
-        except Exception as e:
+    seen_log = open_journal(state_path)
+    map_log = open_journal(id_map_path)
+
+    def _snapshot_state() -> Dict[str, Any]:
+        state["seen_ids"] = sorted(seen)
+        if sent_count:
+            state["last_seen_ts"] = now_iso
+        return state
+
+    def _checkpoint():
+        # Snapshots first, then empty the journals (open handles: truncate, not remove).
+        save_json(state_path, _snapshot_state())
+        save_json(id_map_path, id_map)
+        for log in (seen_log, map_log):
+            log.flush()
+            log.truncate(0)
+
+    def _record(m: Dict[str, Any], dest_id: str):
+        nonlocal sent_count
+        # First post landed: mark as seen so it is never posted twice.
+        # Save mapping if we got a dest id.
+        seen.add(m["id"])
+        seen_log.write(dumps_json(m["id"]) + "\n")
+        if dest_id:
+            id_map[m["id"]] = dest_id
+            map_log.write(dumps_json([m["id"], dest_id]) + "\n")
+        sent_count += 1
+        if sent_count % CHECKPOINT_EVERY == 0:
+            _checkpoint()
+
+    def _failed(m: Dict[str, Any], e: Exception):
+        # A 4xx other than 429 (413, 400, ...) would fail the same way every run:
+        # mark it seen, as before. Network errors, 429s and 5xx retry next run.
+        status = e.response.status_code if isinstance(e, requests.HTTPError) and e.response is not None else 0
+        if 400 <= status < 500 and status != 429:
+            print(f"[error] Webhook rejected id={m['id']} ({status}); marking seen, not retried", file=sys.stderr)
+            seen.add(m["id"])
+            seen_log.write(dumps_json(m["id"]) + "\n")
+        else:
             print(f"[error] Failed to forward id={m['id']}: {e}", file=sys.stderr)
 
-    state["seen_ids"] = seen
-    save_json(args.state, state)
-    save_json(args.id_map, id_map)
-    print(f"[forward] processed={len(normalized)} forwarded_new={sent_count}")
+    with seen_log, map_log:
+        if concurrency <= 1:
+            for m in pending:
+                try:
+                    _record(m, _forward(m))
+                except Exception as e:
+                    _failed(m, e)
+        else:
+            # Results are recorded on this thread only; workers just read id_map
+            # entries written by earlier waves.
+            with ThreadPoolExecutor(max_workers=concurrency) as ex:
+                for layer in reply_layers(pending):
+                    futs = {ex.submit(_forward, m): m for m in layer}
+                    for fut in as_completed(futs):
+                        m = futs[fut]
+                        try:
+                            _record(m, fut.result())
+                        except Exception as e:
+                            _failed(m, e)
+
+    # Final snapshots are fsynced; checkpoints in between only need the journal.
+    compact_journal(state_path, _snapshot_state(), durable=True)
+    compact_journal(id_map_path, id_map, durable=True)
+    return len(normalized), sent_count
+
+def main():
+    ap = argparse.ArgumentParser(description="Forward new messages from a DiscordChatExporter JSON to a Discord webhook with replies/quotes and attachment size caps.")
+    ap.add_argument("--webhook", required=True, help="Destination Discord webhook URL")
+    ap.add_argument("--json", required=True, help="Path to the JSON file exported this run")
+    ap.add_argument("--state", required=True, help="Path to persistent state.json for dedupe")
+    ap.add_argument("--id-map", default="id_map.json", help="Path to persistent source->dest message ID map (per channel recommended)")
+    ap.add_argument("--max-attach-mb", type=float, default=25.0, help="Max size to re-upload (MB). Too-large files are posted as links.")
+    ap.add_argument("--max-files-per-post", type=int, default=10, help="Max files per webhook post (Discord limit = 10).")
+    ap.add_argument("--concurrency", type=int, default=1,
+                    help="Forward up to N messages at once, in reply-dependency waves (1 = strictly sequential, "
+                         "keeps destination order identical to the source).")
+    ap.add_argument("--gzip", action="store_true",
+                    help="gzip JSON webhook bodies over 1 KB (falls back to plain if the webhook rejects them)")
+    args = ap.parse_args()
+
+    try:
+        processed, sent_count = run(args.webhook, args.json, args.state, args.id_map,
+                                    args.max_attach_mb, args.max_files_per_post, args.concurrency, args.gzip)
+    except RuntimeError as e:
+        print(f"[error] {e}", file=sys.stderr)
+        sys.exit(1)
+    print(f"[forward] processed={processed} forwarded_new={sent_count}")
 
 if __name__ == "__main__":
     main()
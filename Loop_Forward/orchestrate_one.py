@@ -1,10 +1,20 @@
 import argparse
+import contextlib
+import importlib.util
+import inspect
+import io
 import json
+import os
 import subprocess
 import sys
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
+try:
+    import orjson  # optional: parse/serialize straight from/to bytes
+except ImportError:
+    orjson = None
+
 def iso_z(dt: datetime) -> str:
     return dt.astimezone(timezone.utc).replace(microsecond=0).isoformat().replace("+00:00", "Z")
 
@@ -12,13 +22,18 @@ def load_progress(path: Path) -> dict:
     if not path.exists():
         return {"last_before_iso": None}
     try:
+        if orjson is not None:
+            return orjson.loads(path.read_bytes())
         return json.loads(path.read_text(encoding="utf-8"))
     except Exception:
         return {"last_before_iso": None}
 
 def save_progress(path: Path, data: dict) -> None:
     tmp = path.with_suffix(".tmp")
-    tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
+    if orjson is not None:
+        tmp.write_bytes(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        tmp.write_text(json.dumps(data, indent=2), encoding="utf-8")
     tmp.replace(path)
 
 def append_log(log_path: Path, line: str) -> None:
@@ -27,11 +42,15 @@ def append_log(log_path: Path, line: str) -> None:
         f.write(line.rstrip() + "\n")
 
 def enforce_retention(dir_path: Path, keep: int) -> None:
-    files = sorted([p for p in dir_path.glob("*.json") if p.is_file()],
-                   key=lambda p: p.stat().st_mtime, reverse=True)
-    for old in files[keep:]:
+    # scandir: is_file() comes from the directory entry and stat() is cached
+    # per entry, so one stat per file instead of three.
+    with os.scandir(dir_path) as it:
+        entries = [(e.stat().st_mtime, e.path) for e in it
+                   if e.name.endswith(".json") and e.is_file()]
+    entries.sort(reverse=True)
+    for _mtime, old in entries[keep:]:
         try:
-            old.unlink()
+            os.unlink(old)
         except Exception:
             pass
 
@@ -51,6 +70,43 @@ def run(cmd: list[str]) -> tuple[int, str, str]:
                 return b.decode("latin-1", "replace")
     return proc.returncode, _dec(proc.stdout), _dec(proc.stderr)
 
+# Keyword arguments run_inprocess() passes to the forwarder's run().
+FORWARDER_RUN_KWARGS = ("webhook", "json_path", "state_path", "id_map_path",
+                        "max_attach_mb", "max_files_per_post", "use_gzip")
+
+def load_forwarder(path: Path):
+    """
+    Import forward_loop.py from its path so --forwarder-path keeps working in-process.
+    Raises if the script has no run() accepting FORWARDER_RUN_KWARGS, so the
+    caller falls back to the subprocess path instead of failing every window.
+    """
+    spec = importlib.util.spec_from_file_location("forward_loop", str(path))
+    if spec is None or spec.loader is None:
+        raise ImportError(f"cannot import {path}")
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    run_fn = getattr(mod, "run", None)
+    if not callable(run_fn):
+        raise AttributeError(f"{path.name} has no run()")
+    try:
+        inspect.signature(run_fn).bind(**dict.fromkeys(FORWARDER_RUN_KWARGS))
+    except TypeError as e:
+        raise TypeError(f"{path.name} run() has an incompatible signature: {e}") from None
+    return mod
+
+def run_inprocess(fwd, **kwargs) -> tuple[int, str, str]:
+    # Same (rc, stdout, stderr) shape as run(), so logging doesn't change.
+    out, err = io.StringIO(), io.StringIO()
+    rc = 0
+    with contextlib.redirect_stdout(out), contextlib.redirect_stderr(err):
+        try:
+            processed, sent = fwd.run(**kwargs)
+            print(f"[forward] processed={processed} forwarded_new={sent}")
+        except Exception as e:
+            print(f"[error] {e}", file=sys.stderr)
+            rc = 1
+    return rc, out.getvalue(), err.getvalue()
+
 def main():
     ap = argparse.ArgumentParser(description="Export+forward one channel with catch-up, logging, and retention.")
     ap.add_argument("--channel-id", required=True)
@@ -58,15 +114,20 @@ def main():
     ap.add_argument("--exporter-exe", required=True)
     ap.add_argument("--bot-token", required=True)
     ap.add_argument("--export-root", required=True, help="Root dir; per-channel subfolder is created here")
-    ap.add_argument("--state", required=True, help="Path to dedupe state.json (used by forward_new.py)")
+    ap.add_argument("--state", required=True, help="Path to dedupe state.json (used by the forwarder)")
     ap.add_argument("--progress", required=True, help="Path to per-channel progress.json")
     ap.add_argument("--log", help="Path to per-channel .log file (default: <export_dir>/channel.log)")
     ap.add_argument("--window-min", type=int, default=33)
     ap.add_argument("--overlap-min", type=int, default=1)
     ap.add_argument("--retention", type=int, default=100, help="Keep latest N JSON exports per channel")
-    ap.add_argument("--forwarder-path", default=None, help="Path to forward_new.py (defaults to alongside this script)")
+    ap.add_argument("--forwarder-path", default=None, help="Path to the forwarder script (default: forward_loop.py alongside this script). "
+                         "It is imported in-process when it defines a compatible run(); "
+                         "otherwise it is run as a subprocess per window")
     ap.add_argument("--max-attach-mb", type=float, default=25.0)
     ap.add_argument("--max-files-per-post", type=int, default=10)
+    ap.add_argument("--gzip", action="store_true", help="Pass --gzip to the forwarder (compress large JSON webhook bodies)")
+    ap.add_argument("--isolate", action="store_true",
+                    help="Run the forwarder as a subprocess per window (default: in-process, reusing its HTTP sessions)")
     args = ap.parse_args()
 
     channel_id = args.channel_id
@@ -77,6 +138,12 @@ def main():
 
     # forwarder path
     forwarder_py = Path(args.forwarder_path) if args.forwarder_path else Path(__file__).with_name("forward_loop.py")
+    fwd = None
+    if not args.isolate:
+        try:
+            fwd = load_forwarder(forwarder_py)
+        except Exception as e:
+            append_log(log_path, f"[warn] in-process forwarder unavailable ({e}); using subprocess")
 
     # progress & targets
     progress = load_progress(progress_path)
@@ -134,17 +201,30 @@ def main():
 
         # 2) Forward
         id_map_path = str((export_dir / "id_map.json").resolve())  # per-channel map
-        fwd_cmd = [
-            sys.executable, str(forwarder_py),
-            "--webhook", args.webhook,
-            "--json", str(out_json),
-            "--state", args.state,
-            "--id-map", id_map_path,
-            "--max-attach-mb", str(args.max_attach_mb),
-            "--max-files-per-post", str(args.max_files_per_post),
-        ]
-
-        rc2, out2, err2 = run(fwd_cmd)
+        if fwd is not None:
+            rc2, out2, err2 = run_inprocess(
+                fwd,
+                webhook=args.webhook,
+                json_path=str(out_json),
+                state_path=args.state,
+                id_map_path=id_map_path,
+                max_attach_mb=args.max_attach_mb,
+                max_files_per_post=args.max_files_per_post,
+                use_gzip=args.gzip,
+            )
+        else:
+            fwd_cmd = [
+                sys.executable, str(forwarder_py),
+                "--webhook", args.webhook,
+                "--json", str(out_json),
+                "--state", args.state,
+                "--id-map", id_map_path,
+                "--max-attach-mb", str(args.max_attach_mb),
+                "--max-files-per-post", str(args.max_files_per_post),
+            ]
+            if args.gzip:
+                fwd_cmd.append("--gzip")
+            rc2, out2, err2 = run(fwd_cmd)
         append_log(log_path, f"[forward rc={rc2}] {out2.strip() or '(no stdout)'}")
         if err2.strip():
             append_log(log_path, f"[forward stderr] {err2.strip()}")
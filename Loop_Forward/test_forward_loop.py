@@ -0,0 +1,88 @@
+"""
+Run with: python -m unittest test_forward_loop   (from Loop_Forward/)
+Posts go to a throwaway local HTTP server standing in for the webhook.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import forward_loop
+
+
+class _Webhook(BaseHTTPRequestHandler):
+    # Per-test knobs, set on the server instance.
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        srv = self.server
+        with srv.lock:
+            srv.posts.append(body["content"])
+            srv.next_id += 1
+            dest_id = str(srv.next_id)
+        status = 413 if any(s in body["content"] for s in srv.reject) else 200
+        out = json.dumps({"id": dest_id} if status == 200 else {"message": "too large"}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(out)))
+        self.end_headers()
+        self.wfile.write(out)
+
+    def log_message(self, *args):
+        pass
+
+
+def _msg(mid: str, content: str) -> dict:
+    return {"id": mid, "timestamp": f"2024-05-01T10:00:0{mid}+00:00", "content": content,
+            "author": {"name": "user"}, "attachments": [], "embeds": []}
+
+
+class PartialFailureTest(unittest.TestCase):
+    def setUp(self):
+        self.srv = ThreadingHTTPServer(("127.0.0.1", 0), _Webhook)
+        self.srv.lock = threading.Lock()
+        self.srv.posts, self.srv.next_id, self.srv.reject = [], 1000, ()
+        threading.Thread(target=self.srv.serve_forever, daemon=True).start()
+        self.webhook = f"http://127.0.0.1:{self.srv.server_port}/api/webhooks/1/t"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = [os.path.join(self.tmp.name, n) for n in ("export.json", "state.json", "id_map.json")]
+
+    def tearDown(self):
+        self.srv.shutdown()
+        self.srv.server_close()
+        self.tmp.cleanup()
+
+    def _run(self, messages):
+        with open(self.paths[0], "w", encoding="utf-8") as f:
+            json.dump({"messages": messages}, f)
+        forward_loop.run(self.webhook, *self.paths, max_attach_mb=1, max_files_per_post=10)
+
+    def test_failed_later_chunk_is_not_reposted(self):
+        # Message 2 splits into three parts; part 2 is rejected.
+        self.srv.reject = ("(part 2)",)
+        messages = [_msg("1", "short"), _msg("2", "x" * 4500)]
+        self._run(messages)
+        first = list(self.srv.posts)
+        self.assertEqual(len(first), 4)  # msg 1, msg 2 part 1, part 2 (413), part 3
+        self.assertTrue(first[1].startswith("x"))
+
+        self._run(messages)
+        self.assertEqual(self.srv.posts, first)  # nothing re-posted
+
+        with open(self.paths[2], encoding="utf-8") as f:
+            self.assertIn("2", json.load(f))
+
+    def test_permanently_rejected_first_post_is_not_retried(self):
+        self.srv.reject = ("bad",)
+        messages = [_msg("1", "bad"), _msg("2", "good")]
+        self._run(messages)
+        self.assertEqual(self.srv.posts, ["bad", "good"])
+
+        self._run(messages)
+        self.assertEqual(self.srv.posts, ["bad", "good"])
+
+
+if __name__ == "__main__":
+    unittest.main()